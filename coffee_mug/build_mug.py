@@ -10,8 +10,18 @@ Handle extruded ±9mm from XZ plane (18mm wide).
 
 import math
 import re
+from collections import namedtuple
 import cadquery as cq
 import numpy as np
+from OCP.BRepGProp import BRepGProp
+from OCP.GProp import GProp_GProps
+from OCP.BRepAdaptor import BRepAdaptor_Surface
+from OCP.BRepBndLib import BRepBndLib
+from OCP.Bnd import Bnd_Box
+from OCP.GeomAbs import (GeomAbs_Plane, GeomAbs_Cylinder,
+                         GeomAbs_Cone, GeomAbs_Torus,
+                         GeomAbs_BSplineSurface,
+                         GeomAbs_SurfaceOfRevolution)
 
 # ============================================================
 # Parameters
@@ -53,6 +63,9 @@ handle_top_z = 87.0                # top attachment Z (20mm from top)
 
 OUTPUT_PATH = "coffee_mug/coffee_mug.step"
 
+# cos(45°) == sin(45°): midpoint offset of a quarter-circle arc
+_SQRT1_2 = math.sqrt(0.5)
+
 
 # ============================================================
 # Handle geometry computation
@@ -65,35 +78,22 @@ def _find_transition_center(attach_pt, main_center, main_r, trans_r):
     cx, cz = main_center
     d_target = trans_r - main_r  # internal tangency
 
-    # Two circles:
-    # (x - px)^2 + (z - pz)^2 = trans_r^2       ... (1)
-    # (x - cx)^2 + (z - cz)^2 = d_target^2       ... (2)
-    # (2) - (1) gives linear: Ax + Bz = C
-    A = 2 * (px - cx)
-    B = 2 * (pz - cz)
-    C = (d_target**2 - trans_r**2 - cx**2 + px**2 - cz**2 + pz**2)
-
-    # Solve x in terms of z: x = (C - Bz) / A
-    # Sub into circle 1 → quadratic in z
-    a_q = (B / A)**2 + 1
-    b_q = 2 * (B * (px - C / A)) / A - 2 * pz  # simplified
-    # More carefully:
-    # ((C - Bz)/A - px)^2 + (z - pz)^2 = trans_r^2
-    # let u = (C/A - px), v = -B/A
-    u = C / A - px
-    v = -B / A
-    a_q = v**2 + 1
-    b_q = 2 * u * v - 2 * pz
-    c_q = u**2 + pz**2 - trans_r**2
-
-    disc = b_q**2 - 4 * a_q * c_q
-    if disc < 0:
+    # Intersect the circle of radius trans_r about the attachment point
+    # with the circle of radius |d_target| about the main center.
+    # The radical line crosses the center line at distance a from the
+    # attachment point; the two solutions sit ±h off it.
+    ux, uz = cx - px, cz - pz
+    d = math.hypot(ux, uz)
+    a = (trans_r**2 - d_target**2 + d**2) / (2 * d)
+    h_sq = trans_r**2 - a**2
+    if h_sq < 0:
         raise ValueError("No real solution for transition center")
+    h = math.sqrt(h_sq)
 
-    z1 = (-b_q + math.sqrt(disc)) / (2 * a_q)
-    z2 = (-b_q - math.sqrt(disc)) / (2 * a_q)
-    x1 = (C - B * z1) / A
-    x2 = (C - B * z2) / A
+    ux, uz = ux / d, uz / d
+    mx, mz = px + a * ux, pz + a * uz
+    x1, z1 = mx - h * uz, mz + h * ux
+    x2, z2 = mx + h * uz, mz - h * ux
 
     # Pick the solution where the transition center is on the mug side
     # (closer to Z axis, i.e., smaller X)
@@ -112,30 +112,38 @@ def _tangent_point(main_center, main_r, trans_center):
     return (cx + main_r * dx / d, cz + main_r * dz / d)
 
 
-def _arc_point(center, radius, angle_deg):
-    """Point on circle at given angle (0° = +X)."""
-    a = math.radians(angle_deg)
-    return (center[0] + radius * math.cos(a),
-            center[1] + radius * math.sin(a))
+def _arc_point(center, radius, angle):
+    """Point on circle at given angle in radians (0 = +X)."""
+    return (center[0] + radius * math.cos(angle),
+            center[1] + radius * math.sin(angle))
 
 
 def _angle_to(center, point):
-    """Angle from center to point, in degrees."""
-    return math.degrees(math.atan2(point[1] - center[1],
-                                    point[0] - center[0]))
+    """Angle from center to point, in radians."""
+    return math.atan2(point[1] - center[1], point[0] - center[0])
+
+
+# Bulge arc through (47.5, 9), (50, 50), (40.8, 98)
+# Circle center: (-130.0, 40.4), R=180.3  (precomputed)
+_BULGE_ARC = (-130.0, 40.4, 180.3)
 
 
 def _mug_outer_radius_at_z(z):
     """Approximate mug outer radius at height z (on the bulge arc)."""
-    # Bulge arc through (47.5, 9), (50, 50), (40.8, 98)
-    # Circle center: (-130.0, 40.4), R=180.3  (precomputed)
-    h, k, R = -130.0, 40.4, 180.3
+    h, k, R = _BULGE_ARC
     val = R**2 - (z - k)**2
     if val < 0:
         return 0
     return math.sqrt(val) + h
 
 
+def _mug_outer_radius_at_z_batch(z):
+    """Array version of _mug_outer_radius_at_z."""
+    h, k, R = _BULGE_ARC
+    val = R**2 - (np.asarray(z, dtype=float) - k)**2
+    return np.where(val < 0, 0.0, np.sqrt(np.maximum(val, 0.0)) + h)
+
+
 def compute_handle_profile():
     """Compute outer and inner handle edge points."""
     mc = (handle_main_cx, handle_main_cz)
@@ -192,8 +200,8 @@ def build_geometry():
                        (top_r, height - top_cyl_h))
         .lineTo(top_r, height - rim_r)
         .threePointArc(
-            (top_r - rim_r + rim_r * math.cos(math.pi / 4),
-             height - rim_r + rim_r * math.sin(math.pi / 4)),
+            (top_r - rim_r + rim_r * _SQRT1_2,
+             height - rim_r + rim_r * _SQRT1_2),
             (top_r - rim_r, height))
         .lineTo(0, height)
         .close()
@@ -226,7 +234,7 @@ def build_geometry():
     hw = handle_half_width             # 9mm half-width (Y)
     ht = handle_thickness / 2          # 5mm half-thickness (Z)
     fr = handle_fillet_r               # 2mm corner radius
-    c45 = fr * math.cos(math.pi / 4)  # arc midpoint offset
+    c45 = fr * _SQRT1_2                # arc midpoint offset
 
     handle = (
         cq.Workplane("YZ")
@@ -262,8 +270,8 @@ def build_geometry():
                        (inner_top_r, height - top_cyl_h))
         .lineTo(inner_top_r, height - rim_r)
         .threePointArc(
-            (inner_top_r + rim_r - rim_r * math.cos(math.pi / 4),
-             height - rim_r + rim_r * math.sin(math.pi / 4)),
+            (inner_top_r + rim_r - rim_r * _SQRT1_2,
+             height - rim_r + rim_r * _SQRT1_2),
             (inner_top_r + rim_r, height))
         .lineTo(inner_top_r + rim_r, height + 5)
         .lineTo(0, height + 5)
@@ -279,24 +287,24 @@ def build_geometry():
     class HandleJunctionSelector(cq.Selector):
         """Select edges at the handle-body intersection."""
         def filter(self, objectList):
-            selected = []
-            for edge in objectList:
-                bb = edge.BoundingBox()
-                y_span = bb.ymax - bb.ymin
-                z_mid = (bb.zmin + bb.zmax) / 2
-                x_mid = (bb.xmin + bb.xmax) / 2
-                # Junction edges: within handle Y width, near body surface,
-                # near bottom or top attachment Z
-                if y_span < handle_half_width * 2 + 2 and y_span > 0.5:
-                    body_r = _mug_outer_radius_at_z(z_mid)
-                    near_bottom = abs(z_mid - handle_bottom_z) < 12
-                    near_top = abs(z_mid - handle_top_z) < 12
-                    on_body = abs(x_mid - body_r) < 8
-                    if (near_bottom or near_top) and on_body:
-                        selected.append(edge)
-            return selected
-
-    result = result.edges(HandleJunctionSelector()).fillet(handle_fillet)
+            bbs = [edge.BoundingBox() for edge in objectList]
+            y_span = np.array([bb.ymax - bb.ymin for bb in bbs])
+            z_mid = np.array([(bb.zmin + bb.zmax) / 2 for bb in bbs])
+            x_mid = np.array([(bb.xmin + bb.xmax) / 2 for bb in bbs])
+            body_r = _mug_outer_radius_at_z_batch(z_mid)
+            # Junction edges: within handle Y width, near body surface,
+            # near bottom or top attachment Z
+            in_width = (y_span < handle_half_width * 2 + 2) & (y_span > 0.5)
+            near_bottom = np.abs(z_mid - handle_bottom_z) < 12
+            near_top = np.abs(z_mid - handle_top_z) < 12
+            on_body = np.abs(x_mid - body_r) < 8
+            mask = in_width & (near_bottom | near_top) & on_body
+            return [objectList[i] for i in np.flatnonzero(mask)]
+
+    # Union seams are intersection curves; skip the body's lines and
+    # circles before the Python filter
+    result = (result.edges("not (%LINE or %CIRCLE)")
+              .edges(HandleJunctionSelector()).fillet(handle_fillet))
 
     return result
 
@@ -305,111 +313,142 @@ def build_geometry():
 # Face classification
 # ============================================================
 
+# Surface parameters read from OCCT once per face (None where n/a)
+FaceGeom = namedtuple("FaceGeom", ["stype", "radius", "minor_radius", "normal"])
+
+# Face bounds in Bnd_Box.Get() order; same fields the handlers read off a
+# cq BoundBox
+FaceBox = namedtuple("FaceBox", ["xmin", "ymin", "zmin", "xmax", "ymax", "zmax"])
+
+
+def _extract(surf, stype):
+    """Query the adaptor once for everything the label handlers read."""
+    radius = minor_radius = normal = None
+    if stype == GeomAbs_Plane:
+        d = surf.Plane().Axis().Direction()
+        normal = (d.X(), d.Y(), d.Z())
+    elif stype == GeomAbs_Cylinder:
+        radius = surf.Cylinder().Radius()
+    elif stype == GeomAbs_Torus:
+        minor_radius = surf.Torus().MinorRadius()
+    return FaceGeom(stype, radius, minor_radius, normal)
+
+
+def _label_plane(geom, cx, cy, cz, bb):
+    nx, ny, nz = (abs(c) for c in geom.normal)
+    # Handle region: cx > bulge_r (beyond the mug body)
+    is_handle = cx > bulge_r + 2
+
+    if nz > 0.9:
+        if abs(cz) < 0.1:
+            return "bottom"
+        r_centroid = math.sqrt(cx**2 + cy**2)
+        if abs(cz - floor_z) < 0.5 and r_centroid < inner_bottom_r + 2:
+            return "cavity.floor"
+    elif ny > 0.9 and is_handle:
+        # Handle side faces (extruded flat faces)
+        return "handle.side_pos" if cy > 0 else "handle.side_neg"
+    elif nx > 0.5 and is_handle:
+        return "handle.end"
+    return "?"
+
+
+def _label_cylinder(geom, cx, cy, cz, bb):
+    r = geom.radius
+    # Handle flat sides: Y span ±(hw - fillet_r) for rounded cross-section
+    handle_flat_hw = handle_half_width - handle_fillet_r
+    is_handle_cyl = (abs(bb.ymax - handle_flat_hw) < 1 and
+                     abs(bb.ymin + handle_flat_hw) < 1)
+    if is_handle_cyl:
+        return "handle"
+    if abs(r - bottom_r) < 0.5:
+        return "body.bottom_cyl"
+    if abs(r - top_r) < 0.5:
+        return "body.top_cyl"
+    if abs(r - inner_bottom_r) < 0.5:
+        return "cavity.bottom_cyl"
+    if abs(r - inner_top_r) < 0.5:
+        return "cavity.top_cyl"
+    return "?"
+
+
+def _label_cone(geom, cx, cy, cz, bb):
+    return "body.cone"
+
+
+def _label_torus(geom, cx, cy, cz, bb):
+    tor_r = geom.minor_radius
+    if abs(tor_r - wall_thickness / 2) < 0.5 and abs(cz - height) < 5:
+        return "rim"
+    return "body.bulge"
+
+
+def _label_revolution(geom, cx, cy, cz, bb):
+    y_span = bb.ymax - bb.ymin
+    if y_span < handle_half_width:
+        # Narrow Y band → handle corner arc
+        return "handle"
+    max_r = max(abs(bb.xmax), abs(bb.xmin),
+                abs(bb.ymax), abs(bb.ymin))
+    if max_r > (inner_bulge_r + bulge_r) / 2:
+        return "body.bulge"
+    return "cavity.bulge"
+
+
+def _label_bspline(geom, cx, cy, cz, bb):
+    if cx > bulge_r + 2:
+        return "handle"
+    if bb.ymax - bb.ymin < handle_half_width * 3:
+        # Small Y span near body surface → junction fillet
+        return "handle.fillet"
+    return "body.bulge"
+
+
+# Surface type → label handler
+_LABEL_HANDLERS = {
+    GeomAbs_Plane: _label_plane,
+    GeomAbs_Cylinder: _label_cylinder,
+    GeomAbs_Cone: _label_cone,
+    GeomAbs_Torus: _label_torus,
+    GeomAbs_SurfaceOfRevolution: _label_revolution,
+    GeomAbs_BSplineSurface: _label_bspline,
+}
+
+
 def classify_faces(filepath):
     """Classify faces by surface type and centroid position."""
-    from OCP.BRepGProp import BRepGProp
-    from OCP.GProp import GProp_GProps
-    from OCP.BRepAdaptor import BRepAdaptor_Surface
-    from OCP.GeomAbs import (GeomAbs_Plane, GeomAbs_Cylinder,
-                              GeomAbs_Cone, GeomAbs_Torus,
-                              GeomAbs_BSplineSurface,
-                              GeomAbs_SurfaceOfRevolution)
+    # Local bindings for the per-face loop
+    handlers = _LABEL_HANDLERS
+    surface_props = BRepGProp.SurfaceProperties_s
+    adaptor = BRepAdaptor_Surface
+    add_bounds = BRepBndLib.AddOptimal_s
 
     result = cq.importers.importStep(filepath)
     faces = result.faces().vals()
     labels = []
 
+    # One accumulator for all faces (SurfaceProperties_s resets it) and
+    # one bounding box, voided per face
+    props = GProp_GProps()
+    box = Bnd_Box()
     for face in faces:
-        props = GProp_GProps()
-        BRepGProp.SurfaceProperties_s(face.wrapped, props)
+        surface_props(face.wrapped, props)
         centroid = props.CentreOfMass()
         cx, cy, cz = centroid.X(), centroid.Y(), centroid.Z()
-        r_centroid = math.sqrt(cx**2 + cy**2)
 
-        surf = BRepAdaptor_Surface(face.wrapped)
+        surf = adaptor(face.wrapped)
         stype = surf.GetType()
 
-        bb = face.BoundingBox()
-
-        label = "?"
-
-        # Handle region: cx > bulge_r (beyond the mug body)
-        is_handle = cx > bulge_r + 2
-
-        if stype == GeomAbs_Plane:
-            pln = surf.Plane()
-            nz = abs(pln.Axis().Direction().Z())
-            ny = abs(pln.Axis().Direction().Y())
-            nx = abs(pln.Axis().Direction().X())
-
-            if nz > 0.9:
-                if abs(cz) < 0.1:
-                    label = "bottom"
-                elif abs(cz - floor_z) < 0.5 and r_centroid < inner_bottom_r + 2:
-                    label = "cavity.floor"
-            elif ny > 0.9 and is_handle:
-                # Handle side faces (extruded flat faces)
-                if cy > 0:
-                    label = "handle.side_pos"
-                else:
-                    label = "handle.side_neg"
-            elif nx > 0.5 and is_handle:
-                label = "handle.end"
-
-        elif stype == GeomAbs_Cylinder:
-            r = surf.Cylinder().Radius()
-            # Handle flat sides: Y span ±(hw - fillet_r) for rounded cross-section
-            handle_flat_hw = handle_half_width - handle_fillet_r
-            is_handle_cyl = (abs(bb.ymax - handle_flat_hw) < 1 and
-                             abs(bb.ymin + handle_flat_hw) < 1)
-            if is_handle_cyl:
-                label = "handle"
-            elif abs(r - bottom_r) < 0.5:
-                label = "body.bottom_cyl"
-            elif abs(r - top_r) < 0.5:
-                label = "body.top_cyl"
-            elif abs(r - inner_bottom_r) < 0.5:
-                label = "cavity.bottom_cyl"
-            elif abs(r - inner_top_r) < 0.5:
-                label = "cavity.top_cyl"
-
-        elif stype == GeomAbs_Cone:
-            label = "body.cone"
-
-        elif stype == GeomAbs_Torus:
-            tor_r = surf.Torus().MinorRadius()
-            if abs(tor_r - wall_thickness / 2) < 0.5 and abs(cz - height) < 5:
-                label = "rim"
-            else:
-                label = "body.bulge"
-
-        elif stype == GeomAbs_SurfaceOfRevolution:
-            y_span = bb.ymax - bb.ymin
-            if y_span < handle_half_width:
-                # Narrow Y band → handle corner arc
-                label = "handle"
-            else:
-                max_r = max(abs(bb.xmax), abs(bb.xmin),
-                            abs(bb.ymax), abs(bb.ymin))
-                if max_r > (inner_bulge_r + bulge_r) / 2:
-                    label = "body.bulge"
-                else:
-                    label = "cavity.bulge"
-
-        elif stype == GeomAbs_BSplineSurface:
-            y_span = bb.ymax - bb.ymin
-            if is_handle:
-                label = "handle"
-            elif y_span < handle_half_width * 3:
-                # Small Y span near body surface → junction fillet
-                label = "handle.fillet"
-            else:
-                label = "body.bulge"
-
+        handler = handlers.get(stype)
+        if handler is None:
+            labels.append(f"?_type{stype}")
         else:
-            label = f"?_type{stype}"
-
-        labels.append(label)
+            geom = _extract(surf, stype)
+            # Optimal bounds, as face.BoundingBox() computes them
+            box.SetVoid()
+            add_bounds(face.wrapped, box)
+            bb = FaceBox(*box.Get())
+            labels.append(handler(geom, cx, cy, cz, bb))
 
     return labels
 
@@ -418,34 +457,47 @@ def classify_faces(filepath):
 # STEP labeling
 # ============================================================
 
+# STEP patterns, compiled once (STEP is ASCII: work on bytes throughout)
+_CLOSED_SHELL_RE = re.compile(rb"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)")
+_ENTITY_REF_RE = re.compile(rb'#(\d+)')
+_ADVANCED_FACE_RE = re.compile(rb"#(\d+)\s*=\s*ADVANCED_FACE\s*\(\s*'([^']*)'")
+
+
 def write_labels(filepath, labels):
     """Write face labels into STEP file via CLOSED_SHELL entity mapping."""
-    with open(filepath, "r") as f:
-        text = f.read()
+    with open(filepath, "rb") as f:
+        data = f.read()
 
-    # Join continuation lines
-    joined = re.sub(r'\n\s+', ' ', text)
-
-    # Find CLOSED_SHELL and extract ADVANCED_FACE IDs
-    shell_match = re.search(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)", joined)
+    # Find CLOSED_SHELL and extract ADVANCED_FACE IDs (the pattern spans
+    # continuation lines, so no joined copy of the file is needed)
+    shell_match = _CLOSED_SHELL_RE.search(data)
     if not shell_match:
         print("ERROR: no CLOSED_SHELL found")
         return
 
-    face_ids = re.findall(r'#(\d+)', shell_match.group(1))
+    face_ids = _ENTITY_REF_RE.findall(shell_match.group(1))
     print(f"CLOSED_SHELL has {len(face_ids)} faces, classifier produced {len(labels)} labels")
 
     if len(face_ids) != len(labels):
         print("WARNING: face count mismatch!")
         return
 
-    # Replace labels in original text (not joined)
-    for fid, label in zip(face_ids, labels):
-        pattern = rf"(#{fid}\s*=\s*ADVANCED_FACE\s*\(\s*')([^']*?)(')"
-        text = re.sub(pattern, rf"\g<1>{label}\g<3>", text)
-
-    with open(filepath, "w") as f:
-        f.write(text)
+    # Locate every ADVANCED_FACE name in one scan, then splice the labels
+    # in file order
+    name_spans = {m.group(1): m.span(2)
+                  for m in _ADVANCED_FACE_RE.finditer(data)}
+    edits = sorted(zip((name_spans[fid] for fid in face_ids), labels))
+
+    out = bytearray()
+    pos = 0
+    for (start, end), label in edits:
+        out += data[pos:start]
+        out += label.encode("ascii")
+        pos = end
+    out += data[pos:]
+
+    with open(filepath, "wb") as f:
+        f.write(out)
 
     unlabeled = sum(1 for l in labels if l.startswith("?"))
     print(f"Wrote {len(labels)} labels ({unlabeled} unlabeled)")
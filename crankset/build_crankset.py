@@ -5,19 +5,33 @@ Build script for labeled track bike crankset (drive-side crank).
 Generates crankset.step with all features and face labels.
 
 Usage:
-    python build_crankset.py
+    python build_crankset.py [--no-cache]
+
+A fully labeled build is cached under $XDG_CACHE_HOME/cad_gen (default
+~/.cache/cad_gen) and reused while this script and the CadQuery/OCP
+versions are unchanged; --no-cache forces a rebuild and leaves the
+cache alone.
 """
 
 import cadquery as cq
+import hashlib
+import importlib.metadata
 import math
+import os
 import re
+import shutil
+import sys
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+import numpy as np
 from OCP.BRepGProp import BRepGProp
 from OCP.GProp import GProp_GProps
 from OCP.GeomAbs import (
     GeomAbs_Plane, GeomAbs_Cylinder, GeomAbs_Cone,
     GeomAbs_Torus, GeomAbs_BSplineSurface, GeomAbs_SurfaceOfRevolution,
 )
-from OCP.BRepAdaptor import BRepAdaptor_Surface
+from OCP.BRepAdaptor import BRepAdaptor_Curve, BRepAdaptor_Surface
+from OCP.BRepFilletAPI import BRepFilletAPI_MakeFillet
 
 # ============================================================
 # Parameters
@@ -51,7 +65,8 @@ axle_bore_depth = 5.0           # depth below front face
 taper_wide = 12.65              # across flats at wide end (mm)
 taper_angle = 2.0               # degrees per side
 taper_length = hub_height       # bore runs full hub height
-taper_narrow = taper_wide - 2 * taper_length * math.tan(math.radians(taper_angle))
+taper_slope = math.tan(math.radians(taper_angle))  # per-side narrowing per mm of Z
+taper_narrow = taper_wide - 2 * taper_length * taper_slope
 
 # Bolt holes
 bolt_hole_dia = 10.0            # chainring bolt clearance holes
@@ -67,6 +82,7 @@ arm_width = 16.0                # constant width of each arm (mm)
 crank_length = 165.0            # center-to-center (spindle to pedal axis)
 crank_arm_thickness = 10.0      # constant Z thickness
 crank_arm_width = 24.0          # constant Y width
+arm_x_inner = 10.0              # arm root: 10mm past hub center
 
 # Pedal boss
 pedal_boss_dia = 27.0           # boss cylinder diameter, matches arm width
@@ -89,6 +105,8 @@ fillet_boss_junction = 8.0      # arm-to-boss blending fillet
 
 # Crank arm direction: arm #1 aligned with XZ plane (+X axis)
 crank_arm_angle = 0.0           # degrees from +X axis
+arm_angles = tuple((crank_arm_angle + i * arm_angular_spacing) % 360
+                   for i in range(n_arms))
 
 # Back-side revolved cut (triangular profile)
 back_cut_od_r = bcd_r - bolt_hole_r - 3  # 64mm, clears bolt holes inside BCD
@@ -117,19 +135,18 @@ def _arc_point(r, angle_deg):
     return (r * math.cos(a), r * math.sin(a))
 
 
-def _arm_edge_point(arm_angle_deg, side, radius):
+def _arm_edge_point(ct, st, side, radius):
     """Where a constant-width arm edge intersects a circle.
 
+    ct, st: cos/sin of the arm angle (scalars, or arrays for several arms).
     side: +1 = right/CCW edge, -1 = left/CW edge.
-    The arm centerline is radial at arm_angle_deg. Edges are parallel
+    The arm centerline is radial at the arm angle. Edges are parallel
     lines offset by arm_width/2 perpendicular to the centerline.
     """
-    theta = math.radians(arm_angle_deg)
     w2 = arm_width / 2.0
-    t = math.sqrt(radius**2 - w2**2)
-    x = t * math.cos(theta) - side * w2 * math.sin(theta)
-    y = t * math.sin(theta) + side * w2 * math.cos(theta)
-    return (x, y)
+    t = math.sqrt(radius * radius - w2 * w2)
+    sw = side * w2
+    return (t * ct - sw * st, t * st + sw * ct)
 
 
 def build_geometry():
@@ -195,11 +212,24 @@ def build_geometry():
     # --- Step 5: Arm window cuts ---
     # Constant-width arms with parallel edges. Inner arc slightly OUTSIDE
     # hub_od_r to avoid tangent boolean hang — leaves hub protruding slightly.
-    arm_angles = [(crank_arm_angle + i * arm_angular_spacing) % 360
-                  for i in range(n_arms)]
+    # All five window outlines are assembled directly as edge wires,
+    # extruded together and removed with a single cut.
+    arm_rad = np.radians(arm_angles)
+    arm_cos = np.cos(arm_rad)
+    arm_sin = np.sin(arm_rad)
+
     inner_r = hub_od_r + 0.5  # outside hub to avoid tangent; hub protrudes
     outer_r = spider_od_r + 1
 
+    # Window corners for every arm at once: right edge of each arm (A, B)
+    # and left edge of the next arm (C, D)
+    A_x, A_y = _arm_edge_point(arm_cos, arm_sin, +1, inner_r)
+    B_x, B_y = _arm_edge_point(arm_cos, arm_sin, +1, outer_r)
+    C_x, C_y = _arm_edge_point(np.roll(arm_cos, -1), np.roll(arm_sin, -1), -1, outer_r)
+    D_x, D_y = _arm_edge_point(np.roll(arm_cos, -1), np.roll(arm_sin, -1), -1, inner_r)
+
+    window_z = -1
+    window_wires = []
     for i in range(n_arms):
         a_this = arm_angles[i]
         a_next = arm_angles[(i + 1) % n_arms]
@@ -207,26 +237,34 @@ def build_geometry():
             a_next += 360
         w_center = (a_this + a_next) / 2.0
 
-        A = _arm_edge_point(a_this, +1, inner_r)
-        B = _arm_edge_point(a_this, +1, outer_r)
-        C = _arm_edge_point(a_next, -1, outer_r)
-        D = _arm_edge_point(a_next, -1, inner_r)
-
         outer_mid = _arc_point(outer_r, w_center)
         inner_mid = _arc_point(inner_r, w_center)
 
-        window = (
-            cq.Workplane("XY")
-            .workplane(offset=-1)
-            .moveTo(*A)
-            .lineTo(*B)
-            .threePointArc(outer_mid, C)
-            .lineTo(*D)
-            .threePointArc(inner_mid, A)
-            .close()
-            .extrude(hub_height + 2)
+        A, B, C, D, outer_mid, inner_mid = (
+            cq.Vector(float(x), float(y), window_z)
+            for x, y in ((A_x[i], A_y[i]), (B_x[i], B_y[i]),
+                         (C_x[i], C_y[i]), (D_x[i], D_y[i]),
+                         outer_mid, inner_mid)
         )
-        spider = spider.cut(window)
+        window_wires.append(cq.Wire.assembleEdges([
+            cq.Edge.makeLine(A, B),
+            cq.Edge.makeThreePointArc(B, outer_mid, C),
+            cq.Edge.makeLine(C, D),
+            cq.Edge.makeThreePointArc(D, inner_mid, A),
+        ]))
+
+    windows = (
+        cq.Workplane("XY")
+        .add(window_wires)
+        .toPending()
+        .extrude(hub_height + 2)
+    )
+    spider = spider.cut(windows)
+
+    # Spider fillets are collected here and applied together after the hub
+    # and bolt hole cuts (Step 8b), so those booleans run on the simpler
+    # unfilleted body. Both selectors pick edges the later cuts do not touch.
+    pending_fillets = []
 
     # --- Step 5b: Spider inner corner fillets ---
     # 5mm fillets where arm walls meet hub cylinder (inner edges of windows).
@@ -234,17 +272,16 @@ def build_geometry():
 
     class SpiderInnerCornerSelector(cq.Selector):
         def filter(self, objectList):
-            out = []
-            for obj in objectList:
-                c = obj.Center()
-                bb = obj.BoundingBox()
-                r_c = math.sqrt(c.x**2 + c.y**2)
-                z_span = bb.zmax - bb.zmin
-                if abs(r_c - (hub_od_r + 0.5)) < 2.0 and z_span > 1.0:
-                    out.append(obj)
-            return out
-
-    spider = spider.edges(SpiderInnerCornerSelector()).fillet(spider_corner_fillet_r)
+            # Corner edges are straight lines; for a line the bounding box
+            # center is its midpoint, so no Center() integration is needed
+            lines = [obj for obj in objectList if obj.geomType() == "LINE"]
+            bbs = [obj.BoundingBox() for obj in lines]
+            r_c = np.array([math.hypot(bb.center.x, bb.center.y) for bb in bbs])
+            z_span = np.array([bb.zmax - bb.zmin for bb in bbs])
+            mask = (np.abs(r_c - (hub_od_r + 0.5)) < 2.0) & (z_span > 1.0)
+            return [lines[i] for i in np.flatnonzero(mask)]
+
+    pending_fillets.append((SpiderInnerCornerSelector(), spider_corner_fillet_r))
 
     # --- Step 5c: Shorten hub ---
     # Move hub back face 5mm in +Z (remove bottom 5mm of hub cylinder).
@@ -279,54 +316,58 @@ def build_geometry():
 
     class HubBossEdgeSelector(cq.Selector):
         def filter(self, objectList):
-            out = []
-            for obj in objectList:
-                c = obj.Center()
-                bb = obj.BoundingBox()
-                edge_r = (bb.xmax - bb.xmin) / 2
-                if abs(edge_r - hub_boss_r) < 1.0 and (
-                    abs(c.z - hub_back_offset) < 0.5 or
-                    abs(c.z - back_cut_depth) < 0.5
-                ):
-                    out.append(obj)
-            return out
-
-    spider = spider.edges(HubBossEdgeSelector()).fillet(hub_boss_fillet_r)
+            # Boss edges are circles: read radius and plane Z off the curve
+            circles = [obj for obj in objectList if obj.geomType() == "CIRCLE"]
+            circs = [BRepAdaptor_Curve(obj.wrapped).Circle() for obj in circles]
+            edge_r = np.array([c.Radius() for c in circs])
+            c_z = np.array([c.Location().Z() for c in circs])
+            mask = (np.abs(edge_r - hub_boss_r) < 1.0) & (
+                (np.abs(c_z - hub_back_offset) < 0.5) |
+                (np.abs(c_z - back_cut_depth) < 0.5)
+            )
+            return [circles[i] for i in np.flatnonzero(mask)]
+
+    pending_fillets.append((HubBossEdgeSelector(), hub_boss_fillet_r))
 
     # --- Step 8: Bolt holes ---
     # 5x 10mm through-holes on 144mm BCD, one centered on each arm.
     # 12mm x 1mm counterbore on back surface for barrel nut.
-    for i in range(n_arms):
-        angle = math.radians(arm_angles[i])
-        bx = bcd_r * math.cos(angle)
-        by = bcd_r * math.sin(angle)
-
-        # Through-hole
-        hole = (
-            cq.Workplane("XY")
-            .workplane(offset=-1)
-            .center(bx, by)
-            .circle(bolt_hole_r)
-            .extrude(hub_height + 2)
-        )
-        spider = spider.cut(hole)
-
-        # Counterbore on back face
-        cbore = (
-            cq.Workplane("XY")
-            .workplane(offset=-0.5)
-            .center(bx, by)
-            .circle(bolt_cbore_r)
-            .extrude(bolt_cbore_depth + 0.5)
-        )
-        spider = spider.cut(cbore)
+    # All ten cylinders are fused into one tool and cut in a single boolean.
+    bolt_pts = list(zip((bcd_r * arm_cos).tolist(), (bcd_r * arm_sin).tolist()))
+
+    # Through-holes
+    holes = (
+        cq.Workplane("XY")
+        .workplane(offset=-1)
+        .pushPoints(bolt_pts)
+        .circle(bolt_hole_r)
+        .extrude(hub_height + 2)
+    )
+
+    # Counterbores on back face
+    cbores = (
+        cq.Workplane("XY")
+        .workplane(offset=-0.5)
+        .pushPoints(bolt_pts)
+        .circle(bolt_cbore_r)
+        .extrude(bolt_cbore_depth + 0.5)
+    )
+    spider = spider.cut(holes.union(cbores))
+
+    # --- Step 8b: Apply deferred spider fillets ---
+    # One fillet builder for every selected edge, each with its own radius
+    fillet_builder = BRepFilletAPI_MakeFillet(spider.findSolid().wrapped)
+    for selector, radius in pending_fillets:
+        for edge in spider.edges(selector).vals():
+            fillet_builder.Add(radius, edge.wrapped)
+    spider = spider.newObject(
+        [cq.Shape.cast(fillet_builder.Shape()).fix().clean()])
 
     # --- Step 6+7+10: Combined crank arm + pedal boss ---
     # Arm built via sweep with rounded-rectangle cross-section (4mm corner
     # radii) so arm long-edge fillets are part of the geometry — no fillet
     # API needed. This avoids the OCCT bug where pre-filleting the arm
     # produces a COMPOUND after union with the boss (bore only cuts one body).
-    arm_x_inner = 10              # 10mm past hub center
     arm_x_outer = -crank_length   # pedal end (boss center)
 
     top_z_in = hub_height                    # Z=20 at spider end
@@ -364,29 +405,18 @@ def build_geometry():
 
     # Rounded rectangle cross-section (24mm wide × 10mm tall, 4mm corner radii)
     arm_fillet_r = 4.0
-    w2 = crank_arm_width / 2        # 12mm half-width
-    h2 = crank_arm_thickness / 2    # 5mm half-height
-    c45 = arm_fillet_r * math.cos(math.radians(45))
-    s45 = arm_fillet_r * math.sin(math.radians(45))
+    arm_section = (
+        cq.Sketch()
+        .rect(crank_arm_width, crank_arm_thickness)
+        .vertices()
+        .fillet(arm_fillet_r)
+    )
 
     crank_arm = (
         cq.Workplane("YZ")
         .workplane(offset=arm_x_inner)
         .center(0, mid_z_in)
-        .moveTo(-w2 + arm_fillet_r, -h2)
-        .lineTo(w2 - arm_fillet_r, -h2)
-        .threePointArc((w2 - arm_fillet_r + c45, -h2 + arm_fillet_r - s45),
-                       (w2, -h2 + arm_fillet_r))
-        .lineTo(w2, h2 - arm_fillet_r)
-        .threePointArc((w2 - arm_fillet_r + c45, h2 - arm_fillet_r + s45),
-                       (w2 - arm_fillet_r, h2))
-        .lineTo(-w2 + arm_fillet_r, h2)
-        .threePointArc((-w2 + arm_fillet_r - c45, h2 - arm_fillet_r + s45),
-                       (-w2, h2 - arm_fillet_r))
-        .lineTo(-w2, -h2 + arm_fillet_r)
-        .threePointArc((-w2 + arm_fillet_r - c45, -h2 + arm_fillet_r - s45),
-                       (-w2 + arm_fillet_r, -h2))
-        .close()
+        .placeSketch(arm_section)
         .sweep(cq.Wire.assembleEdges([path_wire]), isFrenet=True)
     )
 
@@ -431,22 +461,18 @@ def build_geometry():
 
     class BossJunctionSelector(cq.Selector):
         def filter(self, objectList):
-            out = []
-            for obj in objectList:
-                bb = obj.BoundingBox()
-                c = obj.Center()
-                dist = math.sqrt((c.x - boss_cx)**2 + c.y**2)
-                if dist > pedal_boss_r + 3:
-                    continue
-                # Skip full circles (boss flat face edges, cylinder sections)
-                x_span = bb.xmax - bb.xmin
-                y_span = bb.ymax - bb.ymin
-                is_circle = (abs(x_span - y_span) < 1.0 and x_span > 10
-                             and abs(c.x - boss_cx) < 1.0)
-                if is_circle:
-                    continue
-                out.append(obj)
-            return out
+            bbs = [obj.BoundingBox() for obj in objectList]
+            centers = [obj.Center() for obj in objectList]
+            c_x = np.array([c.x for c in centers])
+            c_y = np.array([c.y for c in centers])
+            x_span = np.array([bb.xmax - bb.xmin for bb in bbs])
+            y_span = np.array([bb.ymax - bb.ymin for bb in bbs])
+            near_boss = np.hypot(c_x - boss_cx, c_y) <= pedal_boss_r + 3
+            # Skip full circles (boss flat face edges, cylinder sections)
+            is_circle = ((np.abs(x_span - y_span) < 1.0) & (x_span > 10)
+                         & (np.abs(c_x - boss_cx) < 1.0))
+            mask = near_boss & ~is_circle
+            return [objectList[i] for i in np.flatnonzero(mask)]
 
     crank_combined = crank_combined.edges(BossJunctionSelector()).fillet(fillet_boss_junction)
 
@@ -462,7 +488,6 @@ def build_geometry():
         .circle(pedal_bore_r)
         .extrude(pedal_boss_z_face + 2)
     )
-    spider = spider.cut(pedal_hole)
 
     # --- Step 5e: Axle bore (blind hole from front face) ---
     # 20mm diameter, 5mm below front face, through everything above.
@@ -474,7 +499,6 @@ def build_geometry():
         .circle(axle_bore_r)
         .extrude(pedal_boss_z_face - axle_bore_floor_z + 2)  # past arm top surface
     )
-    spider = spider.cut(axle_bore)
 
     # --- Step 5f: JIS square taper bore ---
     # Tapered square hole along Z axis, wide end at back face.
@@ -483,22 +507,20 @@ def build_geometry():
     taper_z_top = axle_bore_floor_z + 1        # past bore floor to merge cleanly
     taper_span = taper_z_top - taper_z_bottom
 
-    # Across-flats at bottom (wide) and top (narrow) of the cut
-    af_bottom = taper_wide + 2 * (hub_back_offset - taper_z_bottom) * math.tan(math.radians(taper_angle))
-    af_top = taper_wide - 2 * (taper_z_top - hub_back_offset) * math.tan(math.radians(taper_angle))
+    # Across-flats at bottom (wide end) of the cut
+    af_bottom = taper_wide + 2 * (hub_back_offset - taper_z_bottom) * taper_slope
 
+    # Tapered extrude rather than a loft: gives 4 exact planar walls
+    # (a loft makes BSpline faces) narrowing by taper_slope per side
     taper_bore = (
         cq.Workplane("XY")
         .workplane(offset=taper_z_bottom)
         .rect(af_bottom, af_bottom)
-        .workplane(offset=taper_span)
-        .rect(af_top, af_top)
-        .loft()
+        .extrude(taper_span, taper=taper_angle)
     )
-    spider = spider.cut(taper_bore)
-
-    # Ensure single solid body
-    spider = spider.clean()
+    # Pedal bore, axle bore and taper bore removed in one boolean.
+    # cut() cleans its result by default, so no trailing clean() pass.
+    spider = spider.cut(pedal_hole.union(axle_bore).union(taper_bore))
 
     return spider
 
@@ -507,20 +529,190 @@ def build_geometry():
 # Face labeling
 # ============================================================
 
+_INV_ARM_SPACING = 1.0 / arm_angular_spacing
+
+
 def _nearest_arm_index(angle_deg):
-    """Find which spider arm is nearest to the given angle."""
-    arm_angles = [(crank_arm_angle + i * arm_angular_spacing) % 360
-                  for i in range(n_arms)]
-    min_diff = 999
-    best = 0
-    for i, aa in enumerate(arm_angles):
-        diff = abs(angle_deg - aa)
-        if diff > 180:
-            diff = 360 - diff
-        if diff < min_diff:
-            min_diff = diff
-            best = i
-    return best
+    """Find which spider arm is nearest to the given angle(s).
+
+    Arms are equally spaced, so this is the angle from arm #1 rounded to
+    a whole number of arm spacings. Accepts an array of angles and
+    returns an integer array.
+    """
+    steps = ((np.asarray(angle_deg) - crank_arm_angle) % 360) * _INV_ARM_SPACING
+    return np.rint(steps).astype(np.int64) % n_arms
+
+
+# Per-face data computed once in classify_faces and reused by the
+# unlabeled-face report
+FaceMeta = namedtuple("FaceMeta", [
+    "stype", "cx", "cy", "cz", "r_centroid", "angle_deg", "arm_idx",
+    "area", "surf",
+])
+
+
+# Crank arm arc radius (large ~1000mm)
+_arm_span = crank_length + arm_x_inner
+_R_ARM = (_arm_span**2 + (pedal_boss_z_face - hub_height)**2) / (2 * (pedal_boss_z_face - hub_height))
+
+# Cylindrical face rules in priority order: (radius, tolerance, rule).
+# A rule returns a label from the face's FaceMeta, or None if its
+# position test fails.
+_CYL_RULES = [
+    (5.0, 0.5,
+     lambda m: f"spider.fillet_{m.arm_idx + 1:02d}" if m.r_centroid < hub_od_r + 7 else None),
+    (_R_ARM, 5.0,
+     lambda m: (("arm.top" if m.cz > (hub_height + pedal_boss_z_face) / 2 - crank_arm_thickness / 2
+                 else "arm.bottom") if m.cx < hub_od_r else None)),
+    (spider_od_r, 1.0, lambda m: "spider.rim"),
+    (chainring_pocket_id_r, 1.0, lambda m: "chainring.pocket_id"),
+    (hub_boss_r, 1.0,
+     lambda m: "hub.boss" if m.r_centroid < hub_boss_r + 3 else None),
+    (axle_bore_r, 0.5,
+     lambda m: "axle.bore_wall" if m.r_centroid < axle_bore_r + 2 else None),
+    # Arcs at window inner edge / hub turn transition
+    (hub_od_r + 0.5, 0.3, lambda m: f"arm.root_{m.arm_idx + 1:02d}"),
+    (hub_od_r + 1, 0.5, lambda m: f"arm.root_{m.arm_idx + 1:02d}"),
+    (hub_od_r, 1.0,
+     lambda m: "hub.arm_junction" if abs(m.cy) > crank_arm_width / 2 - 4 else "hub.outer"),
+    (bolt_hole_r, 0.5,
+     lambda m: f"bolt.hole_{m.arm_idx + 1:02d}" if abs(m.r_centroid - bcd_r) < bolt_hole_r else None),
+    (bolt_cbore_r, 0.5,
+     lambda m: f"bolt.cbore_{m.arm_idx + 1:02d}" if abs(m.r_centroid - bcd_r) < bolt_cbore_r else None),
+    (fillet_boss_junction, 0.5,
+     lambda m: "pedal.fillet" if m.cx < -(crank_length - pedal_boss_r - 5) else None),
+    (pedal_boss_r, 1.0,
+     lambda m: "pedal.boss" if m.cx < -(crank_length - pedal_boss_r) else None),
+    (pedal_bore_r, 0.5, lambda m: "pedal.bore"),
+]
+
+# Same rules sorted by radius for bisect lookup, keeping the priority index
+_CYL_BY_RADIUS = sorted((radius, prio, tol, rule)
+                        for prio, (radius, tol, rule) in enumerate(_CYL_RULES))
+_CYL_RADII = [entry[0] for entry in _CYL_BY_RADIUS]
+_CYL_MAX_TOL = max(tol for _, tol, _ in _CYL_RULES)
+
+
+def _label_cylinder(m):
+    """Label a cylindrical face from its cached FaceMeta.
+
+    Bisects to the rules whose radius is within reach of the cylinder's,
+    then tries the ones that match in priority order; "?" if none apply.
+    """
+    r = m.surf.Cylinder().Radius()
+    lo = bisect_left(_CYL_RADII, r - _CYL_MAX_TOL)
+    hi = bisect_right(_CYL_RADII, r + _CYL_MAX_TOL)
+    hits = sorted((prio, rule) for radius, prio, tol, rule in _CYL_BY_RADIUS[lo:hi]
+                  if abs(r - radius) < tol)
+    for _, rule in hits:
+        label = rule(m)
+        if label is not None:
+            return label
+    return "?"
+
+
+def _label_cone(m):
+    # Two conical faces: back taper (centroid below midpoint) and front taper
+    if m.cz < (back_cut_depth / 2 + spider_thickness / 2):
+        return "spider.back_taper"
+    return "spider.front_taper"
+
+
+def _label_torus(m):
+    if m.cx < -(spider_od_r + 10):
+        return "pedal.fillet"
+    return "fillet"
+
+
+# Arm centerline Z at the spider and boss ends
+_MID_Z_IN = hub_height - crank_arm_thickness / 2            # 15
+_MID_Z_OUT = pedal_boss_z_face - crank_arm_thickness / 2     # 25
+
+
+def _label_revolution(m):
+    # Swept arm corner rounds (rounded cross-section edges).
+    # Disambiguate top vs bottom by Z relative to arm midline.
+    mid_z_at_cx = _MID_Z_IN + (_MID_Z_OUT - _MID_Z_IN) * (arm_x_inner - m.cx) / _arm_span
+    if m.cz > mid_z_at_cx:
+        return "arm.fillet_top_right" if m.cy > 0 else "arm.fillet_top_left"
+    return "arm.fillet_bot_right" if m.cy > 0 else "arm.fillet_bot_left"
+
+
+def _label_bspline(m):
+    # Boss junction fillet surfaces (near pedal boss)
+    if m.cx < -(spider_od_r + 10):
+        return "pedal.fillet"
+    return "?"
+
+
+def _label_plane(m):
+    cx, cy, cz, r_centroid = m.cx, m.cy, m.cz, m.r_centroid
+    nz = m.surf.Plane().Axis().Direction().Z()
+    if abs(nz) > 0.9:
+        # Pedal boss faces (far from center, near crank_length)
+        if cx < -(spider_od_r + 10):
+            boss_back_z = pedal_boss_z_face - pedal_boss_thickness - boss_z_ext_bot
+            if abs(cz - pedal_boss_z_face) < 0.5:
+                return "pedal.face"
+            if abs(cz - boss_back_z) < 0.5:
+                return "pedal.back"
+            return f"pedal.planar_z{cz:.0f}"
+        if abs(cz - bolt_cbore_depth) < 0.2 and abs(r_centroid - bcd_r) < bolt_cbore_r:
+            return f"bolt.cbore_floor_{m.arm_idx + 1:02d}"
+        if abs(cz) < 0.1:
+            return "back"
+        if abs(cz - hub_height) < 0.1:
+            return "front"
+        if abs(cz - (hub_height - axle_bore_depth)) < 0.2 and r_centroid < axle_bore_r:
+            return "axle.bore_floor"
+        if abs(cz - chainring_pocket_floor_z) < 0.2:
+            return "chainring.pocket_floor"
+        if abs(cz - back_cut_depth) < 0.5 and r_centroid > hub_od_r:
+            return "spider.back_shelf"
+        return f"planar_z{cz:.0f}"
+
+    # Near-vertical planar faces
+    if r_centroid < taper_wide and abs(nz) < 0.1:
+        # Square taper bore walls (4 faces near Z axis).
+        # Side from the centroid: the plane normal's sign
+        # depends on how the surface was built.
+        if abs(cx) > abs(cy):
+            return "axle.taper_xp" if cx > 0 else "axle.taper_xn"
+        return "axle.taper_yp" if cy > 0 else "axle.taper_yn"
+    if cx < -(hub_od_r + 5) and abs(cy) < crank_arm_width:
+        # Crank arm side faces
+        return "arm.side_right" if cy > 0 else "arm.side_left"
+    return "planar_vertical"
+
+
+# Surface type -> label function; other surface types stay "?"
+_LABEL_HANDLERS = {
+    GeomAbs_Cylinder: _label_cylinder,
+    GeomAbs_Cone: _label_cone,
+    GeomAbs_Torus: _label_torus,
+    GeomAbs_SurfaceOfRevolution: _label_revolution,
+    GeomAbs_BSplineSurface: _label_bspline,
+    GeomAbs_Plane: _label_plane,
+}
+
+
+# Any dot-separated part starting with 0-5 marks a per-instance number
+_NUMBERED_PART_RE = re.compile(r'(?:^|\.)[0-5]')
+
+
+def _group_key(label):
+    """Summary group for a label: drop the per-instance number."""
+    if not _NUMBERED_PART_RE.search(label):
+        return label
+    parts = label.split('.')
+    # Group numbered items
+    if len(parts) >= 2 and parts[-1].startswith(('0', '1', '2', '3', '4', '5')):
+        return '.'.join(parts[:-1])
+    if len(parts) >= 2 and any(p.startswith(('0', '1', '2', '3', '4', '5'))
+                               for p in parts):
+        # e.g., spider.arm_01.front → spider.arm.front
+        return '.'.join(p.split('_')[0] if p[0].isdigit() else p for p in parts)
+    return label
 
 
 def classify_faces(solid):
@@ -529,179 +721,72 @@ def classify_faces(solid):
     Takes the in-memory CQ solid (not a filepath) so the face count
     matches the STEP CLOSED_SHELL exactly. Re-importing from STEP can
     split faces during the round-trip, causing count mismatches.
+
+    Returns (labels, face_meta, counts): one label and FaceMeta per face
+    in the same order, plus label counts grouped by _group_key.
     """
     occ_faces = solid.faces().vals()
-
-    labels = []
-    for face in occ_faces:
-        props = GProp_GProps()
+    n = len(occ_faces)
+
+    # Pass 1: the only OCCT work — centroid, area and surface per face.
+    # SurfaceProperties_s resets the accumulator, so one instance serves all.
+    cog_xyz = np.empty((n, 3))
+    areas = np.empty(n)
+    surfs = []
+    props = GProp_GProps()
+    for i, face in enumerate(occ_faces):
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         cog = props.CentreOfMass()
-        cx, cy, cz = cog.X(), cog.Y(), cog.Z()
-
-        surf = BRepAdaptor_Surface(face.wrapped)
-        stype = surf.GetType()
-        r_centroid = math.sqrt(cx**2 + cy**2)
-
-        label = "?"
-
-        if stype == GeomAbs_Cylinder:
-            r = surf.Cylinder().Radius()
-            # Crank arm arc radius (large ~1000mm)
-            arm_span = crank_length + 10  # matches arm_x_inner=10
-            R_arm = (arm_span**2 + (pedal_boss_z_face - hub_height)**2) / (2 * (pedal_boss_z_face - hub_height))
-            if abs(r - 5.0) < 0.5 and r_centroid < hub_od_r + 7:
-                angle_deg = math.degrees(math.atan2(cy, cx)) % 360
-                arm_idx = _nearest_arm_index(angle_deg)
-                label = f"spider.fillet_{arm_idx + 1:02d}"
-            elif abs(r - R_arm) < 5.0 and cx < hub_od_r:
-                label = "arm.top" if cz > (hub_height + pedal_boss_z_face) / 2 - crank_arm_thickness / 2 else "arm.bottom"
-            elif abs(r - spider_od_r) < 1.0:
-                label = "spider.rim"
-            elif abs(r - chainring_pocket_id_r) < 1.0:
-                label = "chainring.pocket_id"
-            elif abs(r - hub_boss_r) < 1.0 and r_centroid < hub_boss_r + 3:
-                label = "hub.boss"
-            elif abs(r - axle_bore_r) < 0.5 and r_centroid < axle_bore_r + 2:
-                label = "axle.bore_wall"
-            elif abs(r - (hub_od_r + 0.5)) < 0.3 or abs(r - (hub_od_r + 1)) < 0.5:
-                # Arcs at window inner edge / hub turn transition
-                angle_deg = math.degrees(math.atan2(cy, cx)) % 360
-                arm_idx = _nearest_arm_index(angle_deg)
-                label = f"arm.root_{arm_idx + 1:02d}"
-            elif abs(r - hub_od_r) < 1.0:
-                if abs(cy) > crank_arm_width / 2 - 4:
-                    label = "hub.arm_junction"
-                else:
-                    label = "hub.outer"
-            elif abs(r - bolt_hole_r) < 0.5 and abs(r_centroid - bcd_r) < bolt_hole_r:
-                angle_deg = math.degrees(math.atan2(cy, cx)) % 360
-                arm_idx = _nearest_arm_index(angle_deg)
-                label = f"bolt.hole_{arm_idx + 1:02d}"
-            elif abs(r - bolt_cbore_r) < 0.5 and abs(r_centroid - bcd_r) < bolt_cbore_r:
-                angle_deg = math.degrees(math.atan2(cy, cx)) % 360
-                arm_idx = _nearest_arm_index(angle_deg)
-                label = f"bolt.cbore_{arm_idx + 1:02d}"
-            elif abs(r - fillet_boss_junction) < 0.5 and cx < -(crank_length - pedal_boss_r - 5):
-                label = "pedal.fillet"
-            elif abs(r - pedal_boss_r) < 1.0 and cx < -(crank_length - pedal_boss_r):
-                label = "pedal.boss"
-            elif abs(r - pedal_bore_r) < 0.5:
-                label = "pedal.bore"
-
-        elif stype == GeomAbs_Cone:
-            # Two conical faces: back taper (centroid below midpoint) and front taper
-            if cz < (back_cut_depth / 2 + spider_thickness / 2):
-                label = "spider.back_taper"
-            else:
-                label = "spider.front_taper"
-
-        elif stype == GeomAbs_Torus:
-            if cx < -(spider_od_r + 10):
-                label = "pedal.fillet"
-            else:
-                label = "fillet"
-
-        elif stype == GeomAbs_SurfaceOfRevolution:
-            # Swept arm corner rounds (rounded cross-section edges).
-            # Disambiguate top vs bottom by Z relative to arm midline.
-            _mid_z_in = hub_height - crank_arm_thickness / 2       # 15
-            _mid_z_out = pedal_boss_z_face - crank_arm_thickness / 2  # 25
-            _arm_x_in = 10
-            _arm_x_out = -crank_length
-            mid_z_at_cx = _mid_z_in + (_mid_z_out - _mid_z_in) * (_arm_x_in - cx) / (_arm_x_in - _arm_x_out)
-            if cz > mid_z_at_cx:
-                label = "arm.fillet_top_right" if cy > 0 else "arm.fillet_top_left"
-            else:
-                label = "arm.fillet_bot_right" if cy > 0 else "arm.fillet_bot_left"
-
-        elif stype == GeomAbs_BSplineSurface:
-            # Boss junction fillet surfaces (near pedal boss)
-            if cx < -(spider_od_r + 10):
-                label = "pedal.fillet"
-            # Loft creates BSpline for square taper walls
-            elif r_centroid < taper_wide and abs(cz - 10) < 8:
-                if abs(cx) > abs(cy):
-                    label = "axle.taper_xp" if cx > 0 else "axle.taper_xn"
-                else:
-                    label = "axle.taper_yp" if cy > 0 else "axle.taper_yn"
-
-        elif stype == GeomAbs_Plane:
-            pln = surf.Plane()
-            nz = pln.Axis().Direction().Z()
-            if abs(nz) > 0.9:
-                # Pedal boss faces (far from center, near crank_length)
-                if cx < -(spider_od_r + 10):
-                    boss_back_z = pedal_boss_z_face - pedal_boss_thickness - boss_z_ext_bot
-                    if abs(cz - pedal_boss_z_face) < 0.5:
-                        label = "pedal.face"
-                    elif abs(cz - boss_back_z) < 0.5:
-                        label = "pedal.back"
-                    else:
-                        label = f"pedal.planar_z{cz:.0f}"
-                elif abs(cz - bolt_cbore_depth) < 0.2 and abs(r_centroid - bcd_r) < bolt_cbore_r:
-                    angle_deg = math.degrees(math.atan2(cy, cx)) % 360
-                    arm_idx = _nearest_arm_index(angle_deg)
-                    label = f"bolt.cbore_floor_{arm_idx + 1:02d}"
-                elif abs(cz) < 0.1:
-                    label = "back"
-                elif abs(cz - hub_height) < 0.1:
-                    label = "front"
-                elif abs(cz - (hub_height - axle_bore_depth)) < 0.2 and r_centroid < axle_bore_r:
-                    label = "axle.bore_floor"
-                elif abs(cz - chainring_pocket_floor_z) < 0.2:
-                    label = "chainring.pocket_floor"
-                elif abs(cz - back_cut_depth) < 0.5 and r_centroid > hub_od_r:
-                    label = "spider.back_shelf"
-                else:
-                    label = f"planar_z{cz:.0f}"
-            else:
-                # Near-vertical planar faces
-                if r_centroid < taper_wide and abs(nz) < 0.1:
-                    # Square taper bore walls (4 faces near Z axis)
-                    nx = pln.Axis().Direction().X()
-                    ny = pln.Axis().Direction().Y()
-                    if abs(nx) > abs(ny):
-                        label = "axle.taper_xp" if nx > 0 else "axle.taper_xn"
-                    else:
-                        label = "axle.taper_yp" if ny > 0 else "axle.taper_yn"
-                elif cx < -(hub_od_r + 5) and abs(cy) < crank_arm_width:
-                    # Crank arm side faces
-                    label = "arm.side_right" if cy > 0 else "arm.side_left"
-                else:
-                    label = "planar_vertical"
-
-        labels.append(label)
-
-    return labels
+        cog_xyz[i] = cog.X(), cog.Y(), cog.Z()
+        areas[i] = props.Mass()
+        surfs.append(BRepAdaptor_Surface(face.wrapped))
+
+    # Derived polar position for all faces at once
+    cxs, cys = cog_xyz[:, 0], cog_xyz[:, 1]
+    r_centroids = np.hypot(cxs, cys)
+    angles_deg = np.degrees(np.arctan2(cys, cxs)) % 360
+    arm_idxs = _nearest_arm_index(angles_deg)
+
+    face_meta = [
+        FaceMeta(surf.GetType(), cx, cy, cz, r_c, ang, arm, area, surf)
+        for surf, (cx, cy, cz), r_c, ang, arm, area in zip(
+            surfs, cog_xyz.tolist(), r_centroids.tolist(),
+            angles_deg.tolist(), arm_idxs.tolist(), areas.tolist())
+    ]
+
+    # Pass 2: label rules over the cached per-face data
+    labels = []
+    for meta in face_meta:
+        handler = _LABEL_HANDLERS.get(meta.stype)
+        labels.append(handler(meta) if handler else "?")
+
+    # Group once per distinct label rather than once per face
+    counts = Counter()
+    for label, k in Counter(labels).items():
+        counts[_group_key(label)] += k
+
+    return labels, face_meta, counts
+
+
+# STEP patterns, compiled once (STEP is ASCII: work on bytes throughout)
+_CONTINUATION_RE = re.compile(rb'\n(?=[ \t])')
+_CLOSED_SHELL_RE = re.compile(rb"#\d+\s*=\s*CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]*)\)")
+_ENTITY_REF_RE = re.compile(rb'#(\d+)')
+_ADVANCED_FACE_RE = re.compile(rb"#(\d+)\s*=\s*ADVANCED_FACE\s*\(\s*'([^']*)'")
 
 
 def write_labels(filepath, face_labels):
     """Write face labels into STEP file via CLOSED_SHELL entity mapping."""
-    with open(filepath) as f:
+    with open(filepath, 'rb') as f:
         content = f.read()
 
     # Join STEP continuation lines
-    lines = content.split('\n')
-    joined = []
-    for line in lines:
-        if line and line[0] in (' ', '\t') and joined:
-            joined[-1] += line
-        else:
-            joined.append(line)
-
-    # Parse entities
-    entities = {}
-    for i, line in enumerate(joined):
-        m = re.match(r'^#(\d+)\s*=\s*(.*)', line)
-        if m:
-            entities[int(m.group(1))] = (m.group(2).strip(), i)
+    data = _CONTINUATION_RE.sub(b'', content)
 
     # Find ALL CLOSED_SHELLs → ordered ADVANCED_FACE entity IDs
     face_eids = []
-    for eid, (text, _) in entities.items():
-        if text.startswith('CLOSED_SHELL'):
-            face_eids.extend(int(x) for x in re.findall(r'#(\d+)', text))
+    for m in _CLOSED_SHELL_RE.finditer(data):
+        face_eids.extend(int(x) for x in _ENTITY_REF_RE.findall(m.group(1)))
 
     if not face_eids:
         raise RuntimeError("No CLOSED_SHELL found in STEP file")
@@ -710,25 +795,104 @@ def write_labels(filepath, face_labels):
         f"STEP has {len(face_eids)} faces but got {len(face_labels)} labels"
     )
 
-    # Write labels
-    for idx, eid in enumerate(face_eids):
-        text, line_idx = entities[eid]
-        joined[line_idx] = re.sub(
-            r"ADVANCED_FACE\s*\(\s*'[^']*'",
-            f"ADVANCED_FACE('{face_labels[idx]}'",
-            joined[line_idx],
-        )
-
-    with open(filepath, 'w') as f:
-        f.write('\n'.join(joined))
+    # One scan locates every ADVANCED_FACE name string; splice the labels
+    # in file order
+    name_spans = {int(m.group(1)): m.span(2)
+                  for m in _ADVANCED_FACE_RE.finditer(data)}
+    edits = sorted((name_spans[eid], label)
+                   for eid, label in zip(face_eids, face_labels))
+    out = bytearray()
+    pos = 0
+    for (start, end), label in edits:
+        out += data[pos:start]
+        out += label.encode('ascii')
+        pos = end
+    out += data[pos:]
+
+    with open(filepath, 'wb') as f:
+        f.write(out)
+
+
+def read_labels(filepath):
+    """Face labels of a labeled STEP file, in CLOSED_SHELL order."""
+    with open(filepath, 'rb') as f:
+        data = _CONTINUATION_RE.sub(b'', f.read())
+
+    names = {int(m.group(1)): m.group(2).decode('ascii')
+             for m in _ADVANCED_FACE_RE.finditer(data)}
+    return [names[int(eid)]
+            for m in _CLOSED_SHELL_RE.finditer(data)
+            for eid in _ENTITY_REF_RE.findall(m.group(1))]
+
+
+def _debug_print_face(i, meta):
+    """Print the cached surface data for one face (unlabeled-face report)."""
+    extra = ""
+    if meta.stype == GeomAbs_Cylinder:
+        extra = f" cyl_r={meta.surf.Cylinder().Radius():.2f}"
+    print(f"    Face {i}: type={meta.stype} "
+          f"centroid=({meta.cx:.1f}, {meta.cy:.1f}, {meta.cz:.1f}) "
+          f"area={meta.area:.1f}{extra}")
 
 
 # ============================================================
 # Main
 # ============================================================
 
+def _ocp_version():
+    """Installed OCP version (pip and conda use different dist names)."""
+    for dist in ("cadquery-ocp", "ocp"):
+        try:
+            return importlib.metadata.version(dist)
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return "unknown"
+
+
+def _cache_path():
+    """Cached labeled STEP path in the per-user cache directory.
+
+    All parameters are module-level constants, so this script's source
+    plus the CadQuery and OCP (OCCT) versions determine the topology and
+    face labels; all three go into the key.
+    """
+    key = hashlib.blake2b(digest_size=8)
+    with open(__file__, "rb") as f:
+        key.update(f.read())
+    key.update(f"\0{cq.__version__}\0{_ocp_version()}".encode())
+
+    cache_root = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    cache_dir = os.path.join(cache_root, "cad_gen")
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    return os.path.join(cache_dir, f"crankset_{key.hexdigest()}.step")
+
+
+def _print_summary(labels, counts):
+    print(f"\n{len(labels)} faces:")
+    for k, v in sorted(counts.items()):
+        print(f"  {k}: {v}")
+
+
 if __name__ == "__main__":
-    from collections import Counter
+    use_cache = "--no-cache" not in sys.argv[1:]
+    cache_path = _cache_path() if use_cache else None
+
+    # Only trust a cached file that still reads back fully labeled
+    cached = None
+    if use_cache and os.path.exists(cache_path):
+        try:
+            cached = read_labels(cache_path)
+        except (KeyError, UnicodeDecodeError):
+            cached = None
+        if not cached or not all(l and l != "?" for l in cached):
+            print(f"Ignoring unusable cache file {cache_path}")
+            cached = None
+
+    if cached:
+        print(f"Build inputs unchanged, copying cached {cache_path} to {OUTPUT_PATH}")
+        shutil.copyfile(cache_path, OUTPUT_PATH)
+        _print_summary(cached, Counter(_group_key(l) for l in cached))
+        raise SystemExit(0)
 
     print("Building crankset geometry...")
     result = build_geometry()
@@ -737,47 +901,22 @@ if __name__ == "__main__":
     cq.exporters.export(result, OUTPUT_PATH)
 
     print("Classifying faces...")
-    labels = classify_faces(result)
+    labels, face_meta, counts = classify_faces(result)
 
     print("Writing labels...")
     write_labels(OUTPUT_PATH, labels)
 
-    # Summary
-    counts = Counter()
-    for l in labels:
-        parts = l.split('.')
-        # Group numbered items
-        if len(parts) >= 2 and parts[-1].startswith(('0', '1', '2', '3', '4', '5')):
-            key = '.'.join(parts[:-1])
-        elif len(parts) >= 2 and any(p.startswith(('0', '1', '2', '3', '4', '5'))
-                                     for p in parts):
-            # e.g., spider.arm_01.front → spider.arm.front
-            key = '.'.join(p.split('_')[0] if p[0].isdigit() else p for p in parts)
-        else:
-            key = l
-        counts[key] += 1
-
-    print(f"\n{len(labels)} faces:")
-    for k, v in sorted(counts.items()):
-        print(f"  {k}: {v}")
+    _print_summary(labels, counts)
 
     unlabeled = [l for l in labels if l == "?"]
     if unlabeled:
         print(f"\n  WARNING: {len(unlabeled)} unlabeled faces")
         # Print details for debugging
-        occ_faces = result.faces().vals()
-        for i, (face, lbl) in enumerate(zip(occ_faces, labels)):
+        for i, (meta, lbl) in enumerate(zip(face_meta, labels)):
             if lbl == "?":
-                props = GProp_GProps()
-                BRepGProp.SurfaceProperties_s(face.wrapped, props)
-                cog = props.CentreOfMass()
-                surf = BRepAdaptor_Surface(face.wrapped)
-                stype2 = surf.GetType()
-                extra = ""
-                if stype2 == GeomAbs_Cylinder:
-                    extra = f" cyl_r={surf.Cylinder().Radius():.2f}"
-                print(f"    Face {i}: type={stype2} "
-                      f"centroid=({cog.X():.1f}, {cog.Y():.1f}, {cog.Z():.1f}) "
-                      f"area={props.Mass():.1f}{extra}")
+                _debug_print_face(i, meta)
     else:
         print("\nAll faces labeled.")
+        # Only cache complete builds so unlabeled-face reports still rerun
+        if use_cache:
+            shutil.copyfile(OUTPUT_PATH, cache_path)
@@ -102,37 +102,34 @@ def build_geometry():
     # L-cutter A: removes lower-front + left-back
     a1 = make_box(-big, big, -big, split_y + eps, -big, g)
     a2 = make_box(-big, g, split_y - eps, big, -big, big)
-    cutter_a = a1.union(a2)
+    cutter_a = a1.add(a2)  # both boxes as tools of one cut
     half_a = block.cut(cutter_a)
 
     # L-cutter B: removes upper-front + right-back
     b1 = make_box(-big, big, -big, split_y + eps, -g, big)
     b2 = make_box(-g, big, split_y - eps, big, -big, big)
-    cutter_b = b1.union(b2)
+    cutter_b = b1.add(b2)  # both boxes as tools of one cut
     half_b = block.cut(cutter_b)
 
     # ── Bolt holes (drilled) ──
+    # All four bolts fused into one tool, cut once from each half.
     # Front bolts: Z-direction at cyl_x bore region
-    for x_pos, y_pos in bolt_front:
-        bolt = (
-            cq.Workplane("XY")
-            .transformed(offset=(x_pos, y_pos, 0))
-            .circle(bolt_clearance_r)
-            .extrude(big, both=True)
-        )
-        half_a = half_a.cut(bolt)
-        half_b = half_b.cut(bolt)
-
+    bolts_front = (
+        cq.Workplane("XY")
+        .pushPoints(bolt_front)
+        .circle(bolt_clearance_r)
+        .extrude(big, both=True)
+    )
     # Back bolts: X-direction at cyl_z bore region
-    for y_pos, z_pos in bolt_back:
-        bolt = (
-            cq.Workplane("YZ")
-            .transformed(offset=(y_pos, z_pos, 0))
-            .circle(bolt_clearance_r)
-            .extrude(big, both=True)
-        )
-        half_a = half_a.cut(bolt)
-        half_b = half_b.cut(bolt)
+    bolts_back = (
+        cq.Workplane("YZ")
+        .pushPoints(bolt_back)
+        .circle(bolt_clearance_r)
+        .extrude(big, both=True)
+    )
+    bolts = bolts_front.union(bolts_back)
+    half_a = half_a.cut(bolts)
+    half_b = half_b.cut(bolts)
 
     for name, body in [("half_a", half_a), ("half_b", half_b)]:
         nf = len(body.faces().vals())
@@ -147,9 +144,9 @@ def classify_faces(filepath):
     result = cq.importers.importStep(filepath)
     faces = result.faces().vals()
     labels = []
+    props = GProp_GProps()  # SurfaceProperties_s resets it for each face
 
     for i, face in enumerate(faces):
-        props = GProp_GProps()
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         centroid = props.CentreOfMass()
         cx, cy, cz = centroid.X(), centroid.Y(), centroid.Z()
@@ -158,8 +155,9 @@ def classify_faces(filepath):
         stype = surf.GetType()
 
         if stype == GeomAbs_Cylinder:
-            axis = surf.Cylinder().Axis().Direction()
-            r = surf.Cylinder().Radius()
+            cyl = surf.Cylinder()
+            axis = cyl.Axis().Direction()
+            r = cyl.Radius()
             ax, ay, az = abs(axis.X()), abs(axis.Y()), abs(axis.Z())
             if abs(r - cyl_radius) < 0.1:
                 # Bore or cylinder body
@@ -191,27 +189,32 @@ def classify_faces(filepath):
     return labels
 
 
+_CLOSED_SHELL_RE = re.compile(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)\s*\)")
+_ENTITY_REF_RE = re.compile(r"#(\d+)")
+_ADVANCED_FACE_RE = re.compile(r"(#(\d+)\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'")
+
+
 def write_labels(filepath, labels):
     """Write face labels into STEP file."""
     with open(filepath, "r") as f:
         step_text = f.read()
 
-    cs_pattern = r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)\s*\)"
-    cs_matches = re.findall(cs_pattern, step_text)
-
     face_ids = []
-    for match in cs_matches:
-        ids = re.findall(r"#(\d+)", match)
-        face_ids.extend(ids)
+    for match in _CLOSED_SHELL_RE.findall(step_text):
+        face_ids.extend(_ENTITY_REF_RE.findall(match))
 
     n = min(len(face_ids), len(labels))
     if len(face_ids) != len(labels):
         print(f"WARNING: {len(face_ids)} ADVANCED_FACEs vs {len(labels)} labels")
 
-    for fid, label in zip(face_ids[:n], labels[:n]):
-        pattern = rf"(#{fid}\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'"
-        replacement = rf"\1'{label}'"
-        step_text = re.sub(pattern, replacement, step_text)
+    # Rename every shell face in one pass over the file
+    id_to_label = dict(zip(face_ids[:n], labels[:n]))
+
+    def _rename(m):
+        label = id_to_label.get(m.group(2))
+        return m.group(0) if label is None else f"{m.group(1)}'{label}'"
+
+    step_text = _ADVANCED_FACE_RE.sub(_rename, step_text)
 
     with open(filepath, "w") as f:
         f.write(step_text)
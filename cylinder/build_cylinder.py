@@ -10,6 +10,8 @@ Usage:
 import cadquery as cq
 import math
 import re
+from collections import namedtuple
+import numpy as np
 from OCP.BRepGProp import BRepGProp
 from OCP.GProp import GProp_GProps
 from OCP.GeomAbs import (
@@ -63,25 +65,27 @@ def build_geometry():
     result = cq.Workplane("XY").circle(cyl_radius).extrude(cyl_height)
 
     # Spline bore (star-shaped, Z=20 to Z=50)
-    pts = []
-    for i in range(n_teeth * 2):
-        angle = i * math.pi / n_teeth
-        r = spline_r_min if i % 2 == 0 else spline_r_max
-        pts.append((r * math.cos(angle), r * math.sin(angle)))
-
-    bore_wp = cq.Workplane("XY").workplane(offset=cyl_height - spline_depth)
-    bore_wp = bore_wp.moveTo(pts[0][0], pts[0][1])
-    for p in pts[1:]:
-        bore_wp = bore_wp.lineTo(p[0], p[1])
-    result = result.cut(bore_wp.close().extrude(spline_depth))
+    # Alternating tip/root vertices, evaluated as one batch
+    i = np.arange(n_teeth * 2)
+    angles = i * np.pi / n_teeth
+    r = np.where(i & 1, spline_r_max, spline_r_min)
+    xs = r * np.cos(angles)
+    ys = r * np.sin(angles)
+    pts = list(zip(xs.tolist(), ys.tolist()))
+
+    bore_wp = (
+        cq.Workplane("XY")
+        .workplane(offset=cyl_height - spline_depth)
+        .polyline(pts)
+        .close()
+    )
+    spline_bore = bore_wp.extrude(spline_depth)
 
     # Through bore
-    result = result.cut(
-        cq.Workplane("XY").circle(through_bore_r).extrude(cyl_height)
-    )
+    through_bore = cq.Workplane("XY").circle(through_bore_r).extrude(cyl_height)
 
-    # Top chamfer
-    result = result.cut(
+    # Chamfers and channels
+    chamfer_top = (
         cq.Workplane("XZ")
         .moveTo(0, cyl_height - chamfer_depth)
         .lineTo(chamfer_outer_r, cyl_height)
@@ -89,9 +93,7 @@ def build_geometry():
         .close()
         .revolve(360, (0, 0), (0, 1))
     )
-
-    # Bottom chamfer
-    result = result.cut(
+    chamfer_bot = (
         cq.Workplane("XZ")
         .moveTo(0, chamfer_depth)
         .lineTo(chamfer_outer_r, 0)
@@ -99,40 +101,48 @@ def build_geometry():
         .close()
         .revolve(360, (0, 0), (0, 1))
     )
-
-    # Bottom channel
-    result = result.cut(
+    channel_bot = (
         cq.Workplane("XY").workplane(offset=ch_bot_z)
         .circle(cyl_radius + 1).circle(channel_floor_r)
         .extrude(channel_width)
     )
-
-    # Top channel
-    result = result.cut(
+    channel_top = (
         cq.Workplane("XY").workplane(offset=ch_top_z)
         .circle(cyl_radius + 1).circle(channel_floor_r)
         .extrude(channel_width)
     )
 
+    # Fuse every cutter into one tool and remove it with a single boolean
+    # cut; the bores and chamfers overlap only inside the removed volume
+    tools = (spline_bore.union(through_bore)
+             .union(chamfer_top).union(chamfer_bot)
+             .union(channel_bot).union(channel_top))
+    result = result.cut(tools)
+
     # Fillets on channel floor-wall edges
-    target_zs = [ch_bot_z, ch_bot_z + channel_width,
-                 ch_top_z, ch_top_z + channel_width]
+    target_zs = np.sort([ch_bot_z, ch_bot_z + channel_width,
+                         ch_top_z, ch_top_z + channel_width])
 
     class ChannelFloorEdgeSelector(cq.Selector):
         def filter(self, objectList):
-            out = []
-            for obj in objectList:
-                c = obj.Center()
-                bb = obj.BoundingBox()
-                edge_r = (bb.xmax - bb.xmin) / 2
-                if abs(edge_r - channel_floor_r) < 0.2:
-                    for tz in target_zs:
-                        if abs(c.z - tz) < 0.15:
-                            out.append(obj)
-                            break
-            return out
-
-    result = result.edges(ChannelFloorEdgeSelector()).fillet(channel_fillet_r)
+            # One bounding box per edge: its X span gives the radius,
+            # its mid-Z the plane of a horizontal circle
+            bbs = [obj.BoundingBox() for obj in objectList]
+            edge_r = np.array([(bb.xmax - bb.xmin) / 2 for bb in bbs])
+            z_mid = np.array([(bb.zmin + bb.zmax) / 2 for bb in bbs])
+
+            # Distance to the nearest target Z from its sorted neighbours
+            idx = np.searchsorted(target_zs, z_mid)
+            above = target_zs[np.minimum(idx, len(target_zs) - 1)]
+            below = target_zs[np.maximum(idx - 1, 0)]
+            dz = np.minimum(np.abs(z_mid - above), np.abs(z_mid - below))
+
+            mask = (np.abs(edge_r - channel_floor_r) < 0.2) & (dz < 0.15)
+            return [objectList[i] for i in np.flatnonzero(mask)]
+
+    # Floor-wall edges are circles; prune to those before the Python filter
+    result = (result.edges("%CIRCLE").edges(ChannelFloorEdgeSelector())
+              .fillet(channel_fillet_r))
 
     return result
 
@@ -141,127 +151,169 @@ def build_geometry():
 # Face labeling
 # ============================================================
 
+# Surface parameters read from OCCT once per face
+FaceGeom = namedtuple("FaceGeom", ["stype", "radius", "nz"])
+
+# Spline label tables, indexed by 0-based tooth/groove (and flank: 0=l, 1=r)
+TOOTH_LABELS = np.array([[f"spline.tooth_{t:02d}.l", f"spline.tooth_{t:02d}.r"]
+                         for t in range(1, n_teeth + 1)])
+ROOT_LABELS = np.array([f"spline.root_{g:02d}" for g in range(1, n_teeth + 1)])
+
+
+def _extract(surf, stype):
+    """Cylinder radius / |plane normal Z| for the classifier (NaN / 0 if n/a)."""
+    if stype == GeomAbs_Cylinder:
+        return FaceGeom(stype, surf.Cylinder().Radius(), 0.0)
+    if stype == GeomAbs_Plane:
+        return FaceGeom(stype, math.nan,
+                        abs(surf.Plane().Axis().Direction().Z()))
+    return FaceGeom(stype, math.nan, 0.0)
+
+
+def _tooth_indices(cx, cy, n_teeth):
+    """Tooth index, right-flank flag and groove index from face centroids.
+
+    Indices are 1-based; each tooth spans one pitch starting at its right
+    flank, grooves are centred on the tooth boundaries.
+    """
+    pitch = 360.0 / n_teeth
+    ang = np.degrees(np.arctan2(cy, cx)) % 360
+    # ang can round up to exactly 360.0 just below +X; wrap like groove
+    tooth = (ang // pitch).astype(np.int64) % n_teeth + 1
+    right = (ang % pitch) < pitch / 2
+    groove = ((ang + pitch / 2) / pitch).astype(np.int64) % n_teeth + 1
+    return tooth, right, groove
+
+
 def classify_faces(filepath):
     result = cq.importers.importStep(filepath)
     occ_faces = result.faces().vals()
+    n = len(occ_faces)
+
+    # Pass 1: pull per-face scalars out of OCCT into flat arrays
+    stype = np.empty(n, dtype=np.int64)
+    cx, cy, cz = np.empty(n), np.empty(n), np.empty(n)
+    radius = np.full(n, np.nan)     # cylinder radius, NaN otherwise
+    nz = np.zeros(n)                # |plane normal Z|, 0 otherwise
 
-    labels = []
-    for face in occ_faces:
-        props = GProp_GProps()
+    # SurfaceProperties_s resets the accumulator, so one instance serves all faces
+    props = GProp_GProps()
+    for i, face in enumerate(occ_faces):
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         cog = props.CentreOfMass()
-        cx, cy, cz = cog.X(), cog.Y(), cog.Z()
+        cx[i], cy[i], cz[i] = cog.X(), cog.Y(), cog.Z()
 
         surf = BRepAdaptor_Surface(face.wrapped)
-        stype = surf.GetType()
-        r_centroid = math.sqrt(cx**2 + cy**2)
-
-        label = "?"
-
-        if stype == GeomAbs_Cylinder:
-            r = surf.Cylinder().Radius()
-            if abs(r - cyl_radius) < 0.1:
-                label = "cylinder"
-            elif abs(r - through_bore_r) < 0.1:
-                label = "bore.wall"
-            elif abs(r - channel_floor_r) < 0.2:
-                label = ("channel.bottom.floor" if cz < 25
-                         else "channel.top.floor")
-
-        elif stype == GeomAbs_Cone:
-            label = "chamfer.top" if cz > 25 else "chamfer.bottom"
-
-        elif stype == GeomAbs_Torus:
-            label = ("channel.bottom.fillet" if cz < 25
-                     else "channel.top.fillet")
-
-        elif stype == GeomAbs_BSplineSurface:
-            # Fillets sometimes produce BSpline instead of torus
-            ch_mid_bot = ch_bot_z + channel_width / 2
-            ch_mid_top = ch_top_z + channel_width / 2
-            if r_centroid > 4 and abs(cz - ch_mid_bot) < 2:
-                label = "channel.bottom.fillet"
-            elif r_centroid > 4 and abs(cz - ch_mid_top) < 2:
-                label = "channel.top.fillet"
-
-        elif stype == GeomAbs_Plane:
-            pln = surf.Plane()
-            nz = abs(pln.Axis().Direction().Z())
-
-            if nz > 0.9:
-                # Horizontal faces
-                if abs(cz) < 0.2:
-                    label = "bottom"
-                elif abs(cz - cyl_height) < 0.2:
-                    label = "top"
-                elif abs(cz - (cyl_height - spline_depth)) < 0.5:
-                    # Spline groove root faces at bore-to-spline transition
-                    ang = math.degrees(math.atan2(cy, cx)) % 360
-                    groove = int((ang + 180.0 / n_teeth)
-                                 / (360.0 / n_teeth)) % n_teeth + 1
-                    label = f"spline.root_{groove:02d}"
-                elif abs(cz - ch_bot_z) < 0.2:
-                    label = "channel.bottom.wall_lower"
-                elif abs(cz - (ch_bot_z + channel_width)) < 0.2:
-                    label = "channel.bottom.wall_upper"
-                elif abs(cz - ch_top_z) < 0.2:
-                    label = "channel.top.wall_lower"
-                elif abs(cz - (ch_top_z + channel_width)) < 0.2:
-                    label = "channel.top.wall_upper"
-            else:
-                # Vertical planar faces = spline tooth flanks
-                ang = math.degrees(math.atan2(cy, cx)) % 360
-                tooth = int(ang / (360.0 / n_teeth)) + 1
-                half_step = 180.0 / n_teeth
-                side = "r" if (ang % (360.0 / n_teeth)) < half_step else "l"
-                label = f"spline.tooth_{tooth:02d}.{side}"
-
-        labels.append(label)
-
-    return labels
+        geom = _extract(surf, surf.GetType())
+        stype[i] = int(geom.stype)
+        radius[i] = geom.radius
+        nz[i] = geom.nz
+
+    # Pass 2: geometric tests over all faces at once
+    is_cyl = stype == int(GeomAbs_Cylinder)
+    is_cone = stype == int(GeomAbs_Cone)
+    is_torus = stype == int(GeomAbs_Torus)
+    is_bspline = stype == int(GeomAbs_BSplineSurface)
+    is_plane = stype == int(GeomAbs_Plane)
+    horiz = is_plane & (nz > 0.9)
+    upper = cz > 25
+    lower = cz < 25
+
+    r_centroid = np.hypot(cx, cy)
+    on_floor = is_cyl & (np.abs(radius - channel_floor_r) < 0.2)
+    # Fillets sometimes produce BSpline instead of torus
+    bspline_fillet = is_bspline & (r_centroid > 4)
+
+    # Spline tooth flanks (vertical planes) and groove roots
+    tooth, right, groove = _tooth_indices(cx, cy, n_teeth)
+    tooth_labels = TOOTH_LABELS[tooth - 1, right.astype(np.int64)]
+    root_labels = ROOT_LABELS[groove - 1]
+
+    conditions = [
+        is_cyl & (np.abs(radius - cyl_radius) < 0.1),
+        is_cyl & (np.abs(radius - through_bore_r) < 0.1),
+        on_floor & lower,
+        on_floor,
+        is_cone & upper,
+        is_cone,
+        is_torus & lower,
+        is_torus,
+        bspline_fillet & (np.abs(cz - (ch_bot_z + channel_width / 2)) < 2),
+        bspline_fillet & (np.abs(cz - (ch_top_z + channel_width / 2)) < 2),
+        is_plane & ~horiz,
+        horiz & (np.abs(cz) < 0.2),
+        horiz & (np.abs(cz - cyl_height) < 0.2),
+        # Spline groove root faces at bore-to-spline transition
+        horiz & (np.abs(cz - (cyl_height - spline_depth)) < 0.5),
+        horiz & (np.abs(cz - ch_bot_z) < 0.2),
+        horiz & (np.abs(cz - (ch_bot_z + channel_width)) < 0.2),
+        horiz & (np.abs(cz - ch_top_z) < 0.2),
+        horiz & (np.abs(cz - (ch_top_z + channel_width)) < 0.2),
+    ]
+    choices = [
+        "cylinder",
+        "bore.wall",
+        "channel.bottom.floor",
+        "channel.top.floor",
+        "chamfer.top",
+        "chamfer.bottom",
+        "channel.bottom.fillet",
+        "channel.top.fillet",
+        "channel.bottom.fillet",
+        "channel.top.fillet",
+        tooth_labels,
+        "bottom",
+        "top",
+        root_labels,
+        "channel.bottom.wall_lower",
+        "channel.bottom.wall_upper",
+        "channel.top.wall_lower",
+        "channel.top.wall_upper",
+    ]
+
+    return np.select(conditions, choices, default="?").tolist()
+
+
+# STEP patterns, compiled once (STEP is ASCII: work on bytes throughout)
+_CLOSED_SHELL_RE = re.compile(rb"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]*)\)")
+_CONTINUATION_RE = re.compile(rb"\n(?=[ \t])")
+_ENTITY_REF_RE = re.compile(rb"#(\d+)")
+_ADVANCED_FACE_RE = re.compile(rb"#(\d+)\s*=\s*ADVANCED_FACE\s*\(\s*'([^']*)'")
 
 
 def write_labels(filepath, face_labels):
-    with open(filepath) as f:
+    with open(filepath, 'rb') as f:
         content = f.read()
 
     # Join STEP continuation lines
-    lines = content.split('\n')
-    joined = []
-    for line in lines:
-        if line and line[0] in (' ', '\t') and joined:
-            joined[-1] += line
-        else:
-            joined.append(line)
-
-    # Parse entities
-    entities = {}
-    for i, line in enumerate(joined):
-        m = re.match(r'^#(\d+)\s*=\s*(.*)', line)
-        if m:
-            entities[int(m.group(1))] = (m.group(2).strip(), i)
+    data = _CONTINUATION_RE.sub(b'', content)
 
     # Find CLOSED_SHELL → ordered ADVANCED_FACE entity IDs
-    for eid, (text, _) in entities.items():
-        if text.startswith('CLOSED_SHELL'):
-            face_eids = [int(x) for x in re.findall(r'#(\d+)', text)]
-            break
+    shell = _CLOSED_SHELL_RE.search(data)
+    if not shell:
+        raise RuntimeError("No CLOSED_SHELL found in STEP file")
+    face_eids = [int(x) for x in _ENTITY_REF_RE.findall(shell.group(1))]
 
     assert len(face_eids) == len(face_labels), (
         f"STEP has {len(face_eids)} faces but got {len(face_labels)} labels"
     )
 
-    # Write labels
-    for idx, eid in enumerate(face_eids):
-        text, line_idx = entities[eid]
-        joined[line_idx] = re.sub(
-            r"ADVANCED_FACE\s*\(\s*'[^']*'",
-            f"ADVANCED_FACE('{face_labels[idx]}'",
-            joined[line_idx],
-        )
+    # One scan locates every ADVANCED_FACE name string
+    name_spans = {int(m.group(1)): m.span(2)
+                  for m in _ADVANCED_FACE_RE.finditer(data)}
+
+    # Splice labels in file order
+    edits = sorted(zip((name_spans[eid] for eid in face_eids), face_labels))
+    out = bytearray()
+    pos = 0
+    for (start, end), label in edits:
+        out += data[pos:start]
+        out += label.encode('ascii')
+        pos = end
+    out += data[pos:]
 
-    with open(filepath, 'w') as f:
-        f.write('\n'.join(joined))
+    with open(filepath, 'wb') as f:
+        f.write(out)
 
 
 # ============================================================
@@ -286,9 +338,10 @@ if __name__ == "__main__":
     # Summary
     counts = Counter()
     for l in labels:
-        parts = l.split('.')
-        if parts[0] == 'spline':
-            key = f"spline.{parts[1].split('_')[0]}"
+        if l.startswith("spline.tooth"):
+            key = "spline.tooth"
+        elif l.startswith("spline.root"):
+            key = "spline.root"
         else:
             key = l
         counts[key] += 1
@@ -1,6 +1,6 @@
-import math
 import cadquery as cq
 import re
+import numpy as np
 from OCP.BRepGProp import BRepGProp
 from OCP.GProp import GProp_GProps
 from OCP.BRepAdaptor import BRepAdaptor_Surface
@@ -82,20 +82,20 @@ def build_geometry():
         .extrude(cut_height)
     )
 
+    # Spoke bars are fused first so the ring takes a single cut
     spoke_angle_deg = 360.0 / n_spokes
     bar_length = disc_radius + 5  # one-sided: center to beyond rim
-    for i in range(n_spokes):
-        angle = i * spoke_angle_deg
-        # Half-rectangle from center outward (not full diameter)
-        bar = (
-            cq.Workplane("XY").workplane(offset=-1)
-            .center(bar_length / 2, 0)
-            .rect(bar_length, spoke_width)
-            .extrude(cut_height)
-        )
-        if angle != 0:
-            bar = bar.rotate((0, 0, 0), (0, 0, 1), angle)
-        window_ring = window_ring.cut(bar)
+    # Half-rectangle from center outward (not full diameter)
+    bar = (
+        cq.Workplane("XY").workplane(offset=-1)
+        .center(bar_length / 2, 0)
+        .rect(bar_length, spoke_width)
+        .extrude(cut_height)
+    )
+    bars = bar
+    for i in range(1, n_spokes):
+        bars = bars.union(bar.rotate((0, 0, 0), (0, 0, 1), i * spoke_angle_deg))
+    window_ring = window_ring.cut(bars)
 
     result = result.cut(window_ring)
 
@@ -115,49 +115,58 @@ def classify_faces(filepath):
     """Read exported STEP, classify each face by surface type + centroid."""
     result = cq.importers.importStep(filepath)
     faces = result.faces().vals()
+    n = len(faces)
 
-    labels = []
-    for face in faces:
-        props = GProp_GProps()
+    spoke_angle_deg = 360.0 / n_spokes
+
+    # Pass 1: OCCT queries only — centroid, surface type, cylinder radius
+    cog_xyz = np.empty((n, 3))
+    radii = np.full(n, np.nan)
+    stypes = []
+    props = GProp_GProps()  # SurfaceProperties_s resets it for each face
+    for i, face in enumerate(faces):
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         c = props.CentreOfMass()
-        cx, cy, cz = c.X(), c.Y(), c.Z()
+        cog_xyz[i] = c.X(), c.Y(), c.Z()
 
         surf = BRepAdaptor_Surface(face.wrapped)
         stype = surf.GetType()
-
-        spoke_angle_deg = 360.0 / n_spokes
-
+        stypes.append(stype)
+        if stype == GeomAbs_Cylinder:
+            radii[i] = surf.Cylinder().Radius()
+
+    # Polar position for all faces at once: nearest spoke, window between
+    # spokes, and which side of its spoke each centroid lies on
+    cxs, cys = cog_xyz[:, 0], cog_xyz[:, 1]
+    r_xy = np.hypot(cxs, cys)
+    sector = (np.degrees(np.arctan2(cys, cxs)) % 360) / spoke_angle_deg
+    spoke_idx = np.rint(sector).astype(np.int64) % n_spokes
+    window_idx = np.rint(sector - 0.5).astype(np.int64) % n_spokes
+    spoke_a = np.radians(spoke_idx * spoke_angle_deg)
+    cross = np.cos(spoke_a) * cys - np.sin(spoke_a) * cxs
+
+    # Pass 2: label rules over the cached per-face data
+    labels = []
+    for stype, (cx, cy, cz), r, rxy, si, wi, side_cross in zip(
+            stypes, cog_xyz.tolist(), radii.tolist(), r_xy.tolist(),
+            spoke_idx.tolist(), window_idx.tolist(), cross.tolist()):
         if stype == GeomAbs_Plane:
             if abs(cz - disc_height) < 0.01:
                 label = "top"
             elif abs(cz - rim_height) < 0.1:
-                angle = math.degrees(math.atan2(cy, cx)) % 360
-                si = round(angle / spoke_angle_deg) % n_spokes
                 label = f"top_shelf_{si+1:02d}"
-            elif abs(cz) < 0.01 and math.hypot(cx, cy) < bot_flat_r + 1:
+            elif abs(cz) < 0.01 and rxy < bot_flat_r + 1:
                 label = "bottom"
             elif abs(cz) < 0.01:
-                angle = math.degrees(math.atan2(cy, cx)) % 360
-                si = round(angle / spoke_angle_deg) % n_spokes
                 label = f"bottom_shelf_{si+1:02d}"
             else:
                 # Spoke side face
-                angle = math.degrees(math.atan2(cy, cx)) % 360
-                si = round(angle / spoke_angle_deg) % n_spokes
-                spoke_a = math.radians(si * spoke_angle_deg)
-                cross = math.cos(spoke_a) * cy - math.sin(spoke_a) * cx
-                side = "left" if cross > 0 else "right"
+                side = "left" if side_cross > 0 else "right"
                 label = f"spoke_{si+1:02d}.{side}"
         elif stype == GeomAbs_Cylinder:
-            r = surf.Cylinder().Radius()
             if abs(r - disc_radius) < 0.1:
-                angle = math.degrees(math.atan2(cy, cx)) % 360
-                si = round(angle / spoke_angle_deg) % n_spokes
                 label = f"rim_{si+1:02d}"
             elif abs(r - hub_r) < 0.1:
-                angle = math.degrees(math.atan2(cy, cx)) % 360
-                wi = round(angle / spoke_angle_deg - 0.5) % n_spokes
                 label = f"hub_{wi+1:02d}"
             elif abs(r - center_bore_r) < 0.1:
                 label = "bore"
@@ -180,30 +189,36 @@ def classify_faces(filepath):
 
 
 # ── STEP labeling ───────────────────────────────────────────
+_CLOSED_SHELL_RE = re.compile(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)")
+_ENTITY_REF_RE = re.compile(r"#(\d+)")
+_ADVANCED_FACE_RE = re.compile(r"(#(\d+)\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'")
+
+
 def write_labels(filepath, labels):
     """Map OCC face order → CLOSED_SHELL order, write labels into STEP."""
     with open(filepath, "r") as f:
-        raw = f.read()
-
-    # Join continuation lines
-    text = re.sub(r"\n\s+", " ", raw)
+        text = f.read()
 
+    # No continuation-line join needed: \s in the patterns spans line breaks
     # Find CLOSED_SHELL and extract ordered ADVANCED_FACE IDs
-    cs_match = re.search(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)", text)
+    cs_match = _CLOSED_SHELL_RE.search(text)
     if not cs_match:
         raise RuntimeError("CLOSED_SHELL not found")
 
-    face_ids = re.findall(r"#(\d+)", cs_match.group(1))
+    face_ids = _ENTITY_REF_RE.findall(cs_match.group(1))
     print(f"\n  CLOSED_SHELL has {len(face_ids)} faces, classifier returned {len(labels)} labels")
 
     if len(face_ids) != len(labels):
         raise RuntimeError(f"Face count mismatch: STEP has {len(face_ids)}, classifier has {len(labels)}")
 
-    # Build replacements
-    for fid, label in zip(face_ids, labels):
-        pattern = rf"(#{fid}\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'"
-        replacement = rf"\g<1>'{label}'"
-        text = re.sub(pattern, replacement, text)
+    # Rename every shell face in one pass over the file
+    id_to_label = dict(zip(face_ids, labels))
+
+    def _rename(m):
+        label = id_to_label.get(m.group(2))
+        return m.group(0) if label is None else f"{m.group(1)}'{label}'"
+
+    text = _ADVANCED_FACE_RE.sub(_rename, text)
 
     with open(filepath, "w") as f:
         f.write(text)
@@ -56,8 +56,8 @@ def classify_faces(filepath):
     occ_faces = result.faces().vals()
 
     labels = []
+    props = GProp_GProps()  # SurfaceProperties_s resets it for each face
     for face in occ_faces:
-        props = GProp_GProps()
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         cog = props.CentreOfMass()
         cx, cy, cz = cog.X(), cog.Y(), cog.Z()
@@ -101,50 +101,45 @@ def classify_faces(filepath):
     return labels
 
 
+# STEP patterns, compiled once (STEP is ASCII: work on bytes throughout)
+_CONTINUATION_RE = re.compile(rb'\n(?=[ \t])')
+_CLOSED_SHELL_RE = re.compile(rb"#\d+\s*=\s*CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]*)\)")
+_ENTITY_REF_RE = re.compile(rb'#(\d+)')
+_ADVANCED_FACE_RE = re.compile(rb"#(\d+)\s*=\s*ADVANCED_FACE\s*\(\s*'([^']*)'")
+
+
 def write_labels(filepath, face_labels):
     """Write face labels into STEP file via CLOSED_SHELL entity mapping."""
-    with open(filepath) as f:
+    with open(filepath, 'rb') as f:
         content = f.read()
 
     # Join STEP continuation lines
-    lines = content.split('\n')
-    joined = []
-    for line in lines:
-        if line and line[0] in (' ', '\t') and joined:
-            joined[-1] += line
-        else:
-            joined.append(line)
-
-    # Parse entities
-    entities = {}
-    for i, line in enumerate(joined):
-        m = re.match(r'^#(\d+)\s*=\s*(.*)', line)
-        if m:
-            entities[int(m.group(1))] = (m.group(2).strip(), i)
+    data = _CONTINUATION_RE.sub(b'', content)
 
     # Find CLOSED_SHELL → ordered ADVANCED_FACE entity IDs
-    face_eids = None
-    for eid, (text, _) in entities.items():
-        if text.startswith('CLOSED_SHELL'):
-            face_eids = [int(x) for x in re.findall(r'#(\d+)', text)]
-            break
-
-    assert face_eids is not None, "No CLOSED_SHELL found in STEP file"
+    m = _CLOSED_SHELL_RE.search(data)
+    assert m is not None, "No CLOSED_SHELL found in STEP file"
+    face_eids = [int(x) for x in _ENTITY_REF_RE.findall(m.group(1))]
     assert len(face_eids) == len(face_labels), (
         f"STEP has {len(face_eids)} faces but got {len(face_labels)} labels"
     )
 
-    # Write labels
-    for idx, eid in enumerate(face_eids):
-        text, line_idx = entities[eid]
-        joined[line_idx] = re.sub(
-            r"ADVANCED_FACE\s*\(\s*'[^']*'",
-            f"ADVANCED_FACE('{face_labels[idx]}'",
-            joined[line_idx],
-        )
-
-    with open(filepath, 'w') as f:
-        f.write('\n'.join(joined))
+    # One scan locates every ADVANCED_FACE name string; splice the labels
+    # in file order
+    name_spans = {int(m.group(1)): m.span(2)
+                  for m in _ADVANCED_FACE_RE.finditer(data)}
+    edits = sorted((name_spans[eid], label)
+                   for eid, label in zip(face_eids, face_labels))
+    out = bytearray()
+    pos = 0
+    for (start, end), label in edits:
+        out += data[pos:start]
+        out += label.encode('ascii')
+        pos = end
+    out += data[pos:]
+
+    with open(filepath, 'wb') as f:
+        f.write(out)
 
 
 # ============================================================
@@ -53,18 +53,29 @@ VIEW_ORDER = ["iso", "front", "back", "top", "section"]
 # Mesh loading
 # ============================================================
 
+def _shape_to_mesh(shape, tolerance):
+    """Tessellate a CadQuery shape into PyVista PolyData."""
+    verts, tris = shape.tessellate(tolerance)
+
+    points = np.fromiter(
+        (c for v in verts for c in (v.x, v.y, v.z)),
+        dtype=float, count=3 * len(verts),
+    ).reshape(-1, 3)
+
+    # VTK face array: [3, i, j, k] per triangle, flattened
+    pv_faces = np.empty((len(tris), 4), dtype=np.int64)
+    pv_faces[:, 0] = 3
+    pv_faces[:, 1:] = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+
+    return pv.PolyData(points, pv_faces.ravel())
+
+
 def step_to_mesh(step_path, tolerance=0.5):
     """Load STEP file and tessellate to PyVista PolyData."""
     import cadquery as cq
 
     result = cq.importers.importStep(step_path)
-    shape = result.val()
-    verts, tris = shape.tessellate(tolerance)
-
-    points = np.array([(v.x, v.y, v.z) for v in verts])
-    pv_faces = np.hstack([[3, t[0], t[1], t[2]] for t in tris])
-
-    return pv.PolyData(points, pv_faces)
+    return _shape_to_mesh(result.val(), tolerance)
 
 
 def cq_to_mesh(build_script_path, tolerance=0.5):
@@ -76,13 +87,7 @@ def cq_to_mesh(build_script_path, tolerance=0.5):
     spec.loader.exec_module(mod)
 
     result = mod.build_geometry()
-    shape = result.val()
-    verts, tris = shape.tessellate(tolerance)
-
-    points = np.array([(v.x, v.y, v.z) for v in verts])
-    pv_faces = np.hstack([[3, t[0], t[1], t[2]] for t in tris])
-
-    return pv.PolyData(points, pv_faces)
+    return _shape_to_mesh(result.val(), tolerance)
 
 
 # ============================================================
@@ -151,6 +156,7 @@ def render_views(mesh, output_path, section=False, camera_overrides=None):
         border=True,
     )
 
+    mesh_actor = None
     for idx, name in enumerate(active):
         r, c = divmod(idx, cols)
         p.subplot(r, c)
@@ -172,7 +178,12 @@ def render_views(mesh, output_path, section=False, camera_overrides=None):
             n_key = tuple(int(x) for x in np.sign(normal))
             label = f"Section {axis_names.get(n_key, str(normal))}"
         else:
-            p.add_mesh(mesh, **mesh_kwargs)
+            # One actor shared by every full view: the mesh is uploaded
+            # and its smooth-shading normals computed only once
+            if mesh_actor is None:
+                mesh_actor = p.add_mesh(mesh, **mesh_kwargs)
+            else:
+                p.add_actor(mesh_actor)
             _set_camera(p, mesh,
                         v["direction"],
                         up=v.get("up", [0, 0, 1]),
@@ -84,23 +84,22 @@ def build_geometry():
              .box(block_d * IN, block_h * IN, block_w * IN)
              .translate((block_x_ctr * IN, y_ctr * IN, 0)))
 
-    # Build three flanges and position them
-    top_flange = (make_kf10_flange()
-                  .rotate((0, 0, 0), (1, 0, 0), -90)
-                  .translate((0, block_y_top * IN, 0)))
+    # Build the flange once and place three located copies of it
+    # (rotate about an axis through the origin, then translate)
+    flange = make_kf10_flange().val()
 
-    bot_flange = (make_kf10_flange()
-                  .rotate((0, 0, 0), (1, 0, 0), 90)
-                  .translate((0, block_y_bot * IN, 0)))
+    top_flange = flange.moved(cq.Location(
+        cq.Vector(0, block_y_top * IN, 0), cq.Vector(1, 0, 0), -90))
 
-    side_flange = (make_kf10_flange()
-                   .rotate((0, 0, 0), (0, 1, 0), 90)
-                   .translate((half_d * IN, 0, 0)))
+    bot_flange = flange.moved(cq.Location(
+        cq.Vector(0, block_y_bot * IN, 0), cq.Vector(1, 0, 0), 90))
 
-    # Union all
-    result = block
-    for part in [top_flange, bot_flange, side_flange]:
-        result = result.union(part)
+    side_flange = flange.moved(cq.Location(
+        cq.Vector(half_d * IN, 0, 0), cq.Vector(0, 1, 0), 90))
+
+    # Union all flanges with the block in one boolean
+    result = block.union(
+        cq.Workplane("XY").add([top_flange, bot_flange, side_flange]))
 
     # Fillet block_cross ↔ block_top and block_cross ↔ block_bottom edges
     xf = half_d * IN
@@ -108,28 +107,20 @@ def build_geometry():
     yb = block_y_bot * IN
     tol_e = 1.0  # mm tolerance for edge selection
 
-    fillet_edges = (
-        result.edges()
-        .filter(lambda e: (
-            abs(e.Center().x - xf) < tol_e and
-            (abs(e.Center().y - yt) < tol_e or abs(e.Center().y - yb) < tol_e)
-        ))
+    # Both edge sets go to one fillet call (one BRepFilletAPI build)
+    bottom_edges = cq.selectors.BoxSelector(
+        (xf - tol_e, yb - tol_e, -half_w * IN - tol_e),
+        (xf + tol_e, yb + tol_e,  half_w * IN + tol_e)
+    )
+    top_edges = cq.selectors.BoxSelector(
+        (xf - tol_e, yt - tol_e, -half_w * IN - tol_e),
+        (xf + tol_e, yt + tol_e,  half_w * IN + tol_e)
     )
     result = result.newObject([result.val()]).edges(
-        cq.selectors.BoxSelector(
-            (xf - tol_e, yb - tol_e, -half_w * IN - tol_e),
-            (xf + tol_e, yb + tol_e,  half_w * IN + tol_e)
-        )
-    ).fillet(fillet_r * IN)
-
-    result = result.edges(
-        cq.selectors.BoxSelector(
-            (xf - tol_e, yt - tol_e, -half_w * IN - tol_e),
-            (xf + tol_e, yt + tol_e,  half_w * IN + tol_e)
-        )
+        bottom_edges + top_edges
     ).fillet(fillet_r * IN)
 
-    # Cut bores (after all unions)
+    # Bores (cut after all unions, together with the counterbores)
     y_start = (block_y_bot - flange_len - 1.0) * IN
     y_end   = (block_y_top + flange_len + 1.0) * IN
     y_len   = y_end - y_start
@@ -144,8 +135,6 @@ def build_geometry():
                .circle(bore_r * IN)
                .extrude((half_d + flange_len + 0.5) * IN))
 
-    result = result.cut(y_bore).cut(x_bore)
-
     # Counterbores on each flange front face (cut inward from sealing face)
     cd = cbore_depth * IN
     cr = cbore_r * IN
@@ -169,16 +158,22 @@ def build_geometry():
                .rotate((0,0,0), (0,1,0), 90)
                .translate(((half_d + flange_len - cbore_depth) * IN, 0, 0)))
 
-    result = result.cut(top_cb).cut(bot_cb).cut(side_cb)
+    # Bores and counterbores removed together in one boolean
+    tools = cq.Workplane("XY").add(
+        [y_bore.val(), x_bore.val(), top_cb.val(), bot_cb.val(), side_cb.val()])
+    result = result.cut(tools)
 
     return result
 
 
 # ── Face Classification ──────────────────────────────────────────
-def classify_faces(filepath):
-    """Classify each face by surface type + centroid position."""
-    result = cq.importers.importStep(filepath)
-    faces = result.faces().vals()
+def classify_faces(solid):
+    """Classify each face by surface type + centroid position.
+
+    Takes the in-memory CQ solid rather than re-importing the exported
+    STEP; its face order is the order the writer emits CLOSED_SHELL in.
+    """
+    faces = solid.faces().vals()
 
     # Reference radii in mm
     bore_rmm = bore_r * IN
@@ -197,6 +192,29 @@ def classify_faces(filepath):
     fillet_rmm = fillet_r * IN
     cbore_rmm  = cbore_r * IN
     cbore_dmm  = cbore_depth * IN
+
+    # Loop-invariant positions and thresholds
+    fillet_band = fillet_rmm * 2                  # fillet reach from top/bottom
+    cross_x_min = bx_max * 0.5                    # fillets sit on the +X half
+    front_band  = cbore_dmm * 1.5                 # counterbore wall reach
+    cb_reach    = cbore_rmm * 1.5                 # counterbore bottom extent
+    cb_tol      = 1.0                             # mm — tight tolerance for counterbore bottom
+
+    # Flange front faces (outer ends)
+    top_front  = (block_y_top + flange_len) * IN
+    bot_front  = (block_y_bot - flange_len) * IN
+    side_front = (half_d + flange_len) * IN
+
+    # Counterbore bottom positions (front face minus depth)
+    top_cb_y  = (block_y_top + flange_len - cbore_depth) * IN
+    bot_cb_y  = (block_y_bot - flange_len + cbore_depth) * IN
+    side_cb_x = (half_d + flange_len - cbore_depth) * IN
+
+    # Planar faces beyond these lie on a flange, not the block
+    flange_x_min = bx_max + fl * 0.3
+    flange_y_max = by_top + fl * 0.3
+    flange_y_min = by_bot - fl * 0.3
+
     labels = []
     flange_cyl_n = 0
     flange_cone_n = 0
@@ -205,30 +223,38 @@ def classify_faces(filepath):
     cbore_planar_n = 0
     fillet_n = 0
 
+    # One surface integration per face; the y_bore split and the report
+    # below reuse these centroids
+    centroids = []
+    ybore_indices = []
+    props = GProp_GProps()  # SurfaceProperties_s resets it for each face
+
     for i, face in enumerate(faces):
-        props = GProp_GProps()
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         c = props.CentreOfMass()
         cx, cy, cz = c.X(), c.Y(), c.Z()
+        centroids.append((cx, cy, cz))
         surf = BRepAdaptor_Surface(face.wrapped)
         stype = surf.GetType()
 
         if stype == GeomAbs_Cylinder:
-            r = surf.Cylinder().Radius()
-            axis_d = surf.Cylinder().Axis().Direction()
+            cyl = surf.Cylinder()
+            r = cyl.Radius()
+            axis_d = cyl.Axis().Direction()
             dx, dy, dz = axis_d.X(), axis_d.Y(), axis_d.Z()
 
             if abs(r - bore_rmm) < tol:
                 # Bore surface — distinguish by axis direction
                 if abs(dy) > 0.9:
                     label = "y_bore"
+                    ybore_indices.append(i)
                 elif abs(dx) > 0.9:
                     label = "cross_bore"
                 else:
                     label = f"bore_({dx:.1f},{dy:.1f},{dz:.1f})"
             elif (abs(r - fillet_rmm) < tol and
-                  cx > bx_max * 0.5 and
-                  (abs(cy - by_top) < fillet_rmm * 2 or abs(cy - by_bot) < fillet_rmm * 2)):
+                  cx > cross_x_min and
+                  (abs(cy - by_top) < fillet_band or abs(cy - by_bot) < fillet_band)):
                 # Fillet surface near block_cross ↔ top/bottom edge
                 fillet_n += 1
                 if cy > 0:
@@ -241,13 +267,10 @@ def classify_faces(filepath):
             elif abs(r - base_rmm) < tol:
                 # base_r == cbore_r — distinguish by proximity to front face
                 # Counterbore walls are near the front face (outer end)
-                top_front = (block_y_top + flange_len) * IN
-                bot_front = (block_y_bot - flange_len) * IN
-                side_front = (half_d + flange_len) * IN
                 near_front = (
-                    abs(cy - top_front) < cbore_dmm * 1.5 or
-                    abs(cy - bot_front) < cbore_dmm * 1.5 or
-                    abs(cx - side_front) < cbore_dmm * 1.5
+                    abs(cy - top_front) < front_band or
+                    abs(cy - bot_front) < front_band or
+                    abs(cx - side_front) < front_band
                 )
                 if near_front:
                     cbore_cyl_n += 1
@@ -275,19 +298,13 @@ def classify_faces(filepath):
             norm = pln.Axis().Direction()
             nx, ny, nz = norm.X(), norm.Y(), norm.Z()
 
-            # Counterbore bottom positions (front face minus depth)
-            top_cb_y = (block_y_top + flange_len - cbore_depth) * IN
-            bot_cb_y = (block_y_bot - flange_len + cbore_depth) * IN
-            side_cb_x = (half_d + flange_len - cbore_depth) * IN
-            cb_tol = 1.0  # mm — tight tolerance for counterbore bottom
-
             if abs(nx) > 0.9:
                 # X-normal: counterbore bottom, flange front, block_cross, block_back
                 if (abs(cx - side_cb_x) < cb_tol and
-                    abs(cy) < cbore_rmm * 1.5 and abs(cz) < cbore_rmm * 1.5):
+                    abs(cy) < cb_reach and abs(cz) < cb_reach):
                     cbore_planar_n += 1
                     label = f"counterbore.bottom_{cbore_planar_n}"
-                elif cx > bx_max + fl * 0.3:
+                elif cx > flange_x_min:
                     flange_planar_n += 1
                     label = f"kf_flange.planar_{flange_planar_n}"
                 elif cx > 0:
@@ -297,14 +314,14 @@ def classify_faces(filepath):
             elif abs(ny) > 0.9:
                 # Y-normal: counterbore bottom, flange front, block_top, block_bottom
                 if (abs(cy - top_cb_y) < cb_tol and
-                    abs(cx) < cbore_rmm * 1.5 and abs(cz) < cbore_rmm * 1.5):
+                    abs(cx) < cb_reach and abs(cz) < cb_reach):
                     cbore_planar_n += 1
                     label = f"counterbore.bottom_{cbore_planar_n}"
                 elif (abs(cy - bot_cb_y) < cb_tol and
-                      abs(cx) < cbore_rmm * 1.5 and abs(cz) < cbore_rmm * 1.5):
+                      abs(cx) < cb_reach and abs(cz) < cb_reach):
                     cbore_planar_n += 1
                     label = f"counterbore.bottom_{cbore_planar_n}"
-                elif cy > by_top + fl * 0.3 or cy < by_bot - fl * 0.3:
+                elif cy > flange_y_max or cy < flange_y_min:
                     flange_planar_n += 1
                     label = f"kf_flange.planar_{flange_planar_n}"
                 elif cy > 0:
@@ -325,53 +342,50 @@ def classify_faces(filepath):
 
         labels.append(label)
 
-    # Second pass: if y_bore got split into two faces, rename the lower one
-    ybore_indices = [i for i, l in enumerate(labels) if l == "y_bore"]
+    # If y_bore got split into two faces, rename the lower one
     if len(ybore_indices) == 2:
-        # Find centroids for both, rename the one with lower Y
-        cy_vals = []
-        for idx in ybore_indices:
-            face = faces[idx]
-            props = GProp_GProps()
-            BRepGProp.SurfaceProperties_s(face.wrapped, props)
-            cy_vals.append(props.CentreOfMass().Y())
+        # Rename the one with lower centroid Y
+        cy_vals = [centroids[idx][1] for idx in ybore_indices]
         lower = ybore_indices[0] if cy_vals[0] < cy_vals[1] else ybore_indices[1]
         labels[lower] = "y_bore_bottom"
 
-    for i, label in enumerate(labels):
-        face = faces[i]
-        props = GProp_GProps()
-        BRepGProp.SurfaceProperties_s(face.wrapped, props)
-        c = props.CentreOfMass()
-        print(f"  face {i+1:3d}: c=({c.X():.1f},{c.Y():.1f},{c.Z():.1f}) → {label}")
+    for i, (label, (cx, cy, cz)) in enumerate(zip(labels, centroids)):
+        print(f"  face {i+1:3d}: c=({cx:.1f},{cy:.1f},{cz:.1f}) → {label}")
 
     return labels
 
 
 # ── Write Labels into STEP ───────────────────────────────────────
+_CLOSED_SHELL_RE = re.compile(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)")
+_ENTITY_REF_RE = re.compile(r"#(\d+)")
+_ADVANCED_FACE_RE = re.compile(r"(#(\d+)\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'")
+
+
 def write_labels(filepath, labels):
     """Map OCC face order → CLOSED_SHELL order, write labels into STEP."""
     with open(filepath, "r") as f:
-        raw = f.read()
-
-    # Join continuation lines
-    text = re.sub(r"\n\s+", " ", raw)
+        text = f.read()
 
+    # No continuation-line join needed: \s in the patterns spans line breaks
     # Find CLOSED_SHELL and extract ordered ADVANCED_FACE IDs
-    cs_match = re.search(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)", text)
+    cs_match = _CLOSED_SHELL_RE.search(text)
     if not cs_match:
         raise RuntimeError("CLOSED_SHELL not found")
 
-    face_ids = re.findall(r"#(\d+)", cs_match.group(1))
+    face_ids = _ENTITY_REF_RE.findall(cs_match.group(1))
     print(f"\n  CLOSED_SHELL has {len(face_ids)} faces, classifier returned {len(labels)} labels")
 
     if len(face_ids) != len(labels):
         raise RuntimeError(f"Face count mismatch: STEP has {len(face_ids)}, classifier has {len(labels)}")
 
-    for fid, label in zip(face_ids, labels):
-        pattern = rf"(#{fid}\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'"
-        replacement = rf"\g<1>'{label}'"
-        text = re.sub(pattern, replacement, text)
+    # Rename every shell face in one pass over the file
+    id_to_label = dict(zip(face_ids, labels))
+
+    def _rename(m):
+        label = id_to_label.get(m.group(2))
+        return m.group(0) if label is None else f"{m.group(1)}'{label}'"
+
+    text = _ADVANCED_FACE_RE.sub(_rename, text)
 
     with open(filepath, "w") as f:
         f.write(text)
@@ -382,9 +396,9 @@ def write_labels(filepath, labels):
 # ── Main ─────────────────────────────────────────────────────────
 if __name__ == "__main__":
     result = build_geometry()
-    cq.exporters.export(result, OUTPUT_PATH)
+    labels = classify_faces(result)
 
-    labels = classify_faces(OUTPUT_PATH)
+    cq.exporters.export(result, OUTPUT_PATH)
     write_labels(OUTPUT_PATH, labels)
 
     actual_angle = math.degrees(math.atan2(rim_r - base_r, taper_z))
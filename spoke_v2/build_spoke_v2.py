@@ -1,6 +1,7 @@
 import math
 import cadquery as cq
 import re
+import numpy as np
 from OCP.BRepGProp import BRepGProp
 from OCP.GProp import GProp_GProps
 from OCP.BRepAdaptor import BRepAdaptor_Surface
@@ -73,29 +74,33 @@ def build_geometry():
     )
     result = result.cut(bot_cut)
 
-    # 4. Spoke cutouts — 6 pizza-wedge windows between spokes
-    #    Annular ring from hub (R=17.5) to beyond rim, minus 6 spoke bars
+    # 4. Spoke cutouts — one window between each pair of spokes
+    #    Each window is bounded by the hub arc (R=17.5), the two spoke edges
+    #    (lines offset spoke_half from each spoke axis) and an arc beyond
+    #    the rim, so all windows come from a single extrude
     cut_height = thickness + 2  # oversized for clean through-cut
-    bar_length = radius + 5     # center to beyond rim
+    outer_r = radius + 1        # beyond rim to cut through rim_step + rim
 
-    window_ring = (
-        cq.Workplane("XY").workplane(offset=-1)
-        .circle(radius + 1)
-        .circle(hub_r)
-        .extrude(cut_height)
-    )
+    def polar(r, a):
+        return (r * math.cos(a), r * math.sin(a))
+
+    # Angular offset of a spoke edge from its axis at the hub and outer arcs
+    hub_da = math.asin(spoke_half / hub_r)
+    outer_da = math.asin(spoke_half / outer_r)
+    step = math.radians(spoke_angle_deg)
 
+    windows = cq.Workplane("XY").workplane(offset=-1)
     for i in range(n_spokes):
-        angle = i * spoke_angle_deg
-        bar = (
-            cq.Workplane("XY").workplane(offset=-1)
-            .center(bar_length / 2, 0)
-            .rect(bar_length, spoke_width)
-            .extrude(cut_height)
+        a0, a1 = i * step, (i + 1) * step
+        windows = (
+            windows
+            .moveTo(*polar(hub_r, a0 + hub_da))
+            .threePointArc(polar(hub_r, (a0 + a1) / 2), polar(hub_r, a1 - hub_da))
+            .lineTo(*polar(outer_r, a1 - outer_da))
+            .threePointArc(polar(outer_r, (a0 + a1) / 2), polar(outer_r, a0 + outer_da))
+            .close()
         )
-        if angle != 0:
-            bar = bar.rotate((0, 0, 0), (0, 0, 1), angle)
-        window_ring = window_ring.cut(bar)
+    window_ring = windows.extrude(cut_height)
 
     result = result.cut(window_ring)
 
@@ -103,59 +108,75 @@ def build_geometry():
 
 
 # ── Face classification ─────────────────────────────────────
-def classify_faces(filepath):
-    """Read exported STEP, classify each face by surface type + centroid."""
-    result = cq.importers.importStep(filepath)
-    faces = result.faces().vals()
-
-    labels = []
-    for face in faces:
-        props = GProp_GProps()
+def classify_faces(solid):
+    """Classify each face of the in-memory solid by surface type + centroid.
+
+    Face order matches the CLOSED_SHELL the STEP writer emits, so there
+    is no need to read the exported file back in.
+    """
+    faces = solid.faces().vals()
+    n = len(faces)
+
+    # Pass 1: OCCT queries only — centroid, surface type, radius, cone apex
+    cog_xyz = np.empty((n, 3))
+    radii = np.full(n, np.nan)
+    apex_z = np.full(n, np.nan)
+    stypes = []
+    props = GProp_GProps()  # SurfaceProperties_s resets it for each face
+    for i, face in enumerate(faces):
         BRepGProp.SurfaceProperties_s(face.wrapped, props)
         c = props.CentreOfMass()
-        cx, cy, cz = c.X(), c.Y(), c.Z()
+        cog_xyz[i] = c.X(), c.Y(), c.Z()
 
         surf = BRepAdaptor_Surface(face.wrapped)
         stype = surf.GetType()
-
-        area = props.Mass()
-        r_centroid = math.hypot(cx, cy)
-        angle = math.degrees(math.atan2(cy, cx)) % 360
-
+        stypes.append(stype)
+        if stype == GeomAbs_Cylinder:
+            radii[i] = surf.Cylinder().Radius()
+        elif stype == GeomAbs_Cone:
+            apex_z[i] = surf.Cone().Apex().Z()
+
+    # Polar position for all faces at once: nearest spoke, window between
+    # spokes, and which side of its spoke each centroid lies on
+    cxs, cys = cog_xyz[:, 0], cog_xyz[:, 1]
+    r_xy = np.hypot(cxs, cys)
+    sector = (np.degrees(np.arctan2(cys, cxs)) % 360) / spoke_angle_deg
+    spoke_idx = np.rint(sector).astype(np.int64) % n_spokes
+    window_idx = np.rint(sector - 0.5).astype(np.int64) % n_spokes
+    spoke_a = np.radians(spoke_idx * spoke_angle_deg)
+    cross = np.cos(spoke_a) * cys - np.sin(spoke_a) * cxs
+
+    # Pass 2: label rules over the cached per-face data
+    labels = []
+    for stype, (cx, cy, cz), r, az, rxy, si, wi, side_cross in zip(
+            stypes, cog_xyz.tolist(), radii.tolist(), apex_z.tolist(),
+            r_xy.tolist(), spoke_idx.tolist(), window_idx.tolist(),
+            cross.tolist()):
         if stype == GeomAbs_Plane:
-            if abs(cz) < 0.01 and r_centroid < bot_flat_r + 1:
+            if abs(cz) < 0.01 and rxy < bot_flat_r + 1:
                 label = "bottom"
             elif abs(cz) < 0.01:
-                si = round(angle / spoke_angle_deg) % n_spokes
                 label = f"bottom_ring_{si+1:02d}"
             elif abs(cz - thickness) < 0.01:
                 label = "top"
             elif abs(cz - rim_step_height) < 0.1:
-                si = round(angle / spoke_angle_deg) % n_spokes
                 label = f"rim_step_{si+1:02d}"
             else:
                 # Spoke side faces — vertical planar faces
-                si = round(angle / spoke_angle_deg) % n_spokes
-                spoke_a = math.radians(si * spoke_angle_deg)
-                cross = math.cos(spoke_a) * cy - math.sin(spoke_a) * cx
-                side = "left" if cross > 0 else "right"
+                side = "left" if side_cross > 0 else "right"
                 label = f"spoke_{si+1:02d}.{side}"
         elif stype == GeomAbs_Cylinder:
-            r = surf.Cylinder().Radius()
             if abs(r - radius) < 0.1:
-                si = round(angle / spoke_angle_deg) % n_spokes
                 label = f"rim_{si+1:02d}"
             elif abs(r - hub_r) < 0.1:
                 # Hub arc sits between two spokes
-                wi = round(angle / spoke_angle_deg - 0.5) % n_spokes
                 label = f"hub_{wi+1:02d}"
             elif abs(r - bot_flat_r) < 0.1:
                 label = "recess_wall"
             else:
                 label = f"cyl_r{r:.1f}"
         elif stype == GeomAbs_Cone:
-            apex = surf.Cone().Apex()
-            if apex.Z() > thickness:
+            if az > thickness:
                 label = "top_taper"
             else:
                 label = "bottom_taper"
@@ -169,29 +190,36 @@ def classify_faces(filepath):
 
 
 # ── STEP labeling ───────────────────────────────────────────
+_CLOSED_SHELL_RE = re.compile(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)")
+_ENTITY_REF_RE = re.compile(r"#(\d+)")
+_ADVANCED_FACE_RE = re.compile(r"(#(\d+)\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'")
+
+
 def write_labels(filepath, labels):
     """Map OCC face order → CLOSED_SHELL order, write labels into STEP."""
     with open(filepath, "r") as f:
-        raw = f.read()
-
-    # Join continuation lines
-    text = re.sub(r"\n\s+", " ", raw)
+        text = f.read()
 
+    # No continuation-line join needed: \s in the patterns spans line breaks
     # Find CLOSED_SHELL and extract ordered ADVANCED_FACE IDs
-    cs_match = re.search(r"CLOSED_SHELL\s*\(\s*'[^']*'\s*,\s*\(([^)]+)\)", text)
+    cs_match = _CLOSED_SHELL_RE.search(text)
     if not cs_match:
         raise RuntimeError("CLOSED_SHELL not found")
 
-    face_ids = re.findall(r"#(\d+)", cs_match.group(1))
+    face_ids = _ENTITY_REF_RE.findall(cs_match.group(1))
     print(f"\n  CLOSED_SHELL has {len(face_ids)} faces, classifier returned {len(labels)} labels")
 
     if len(face_ids) != len(labels):
         raise RuntimeError(f"Face count mismatch: STEP has {len(face_ids)}, classifier has {len(labels)}")
 
-    for fid, label in zip(face_ids, labels):
-        pattern = rf"(#{fid}\s*=\s*ADVANCED_FACE\s*\()\s*'[^']*'"
-        replacement = rf"\g<1>'{label}'"
-        text = re.sub(pattern, replacement, text)
+    # Rename every shell face in one pass over the file
+    id_to_label = dict(zip(face_ids, labels))
+
+    def _rename(m):
+        label = id_to_label.get(m.group(2))
+        return m.group(0) if label is None else f"{m.group(1)}'{label}'"
+
+    text = _ADVANCED_FACE_RE.sub(_rename, text)
 
     with open(filepath, "w") as f:
         f.write(text)
@@ -204,12 +232,12 @@ if __name__ == "__main__":
     print("Building spoke_v2 geometry...")
     result = build_geometry()
 
+    print("Classifying faces...")
+    labels = classify_faces(result)
+
     print(f"Exporting to {OUTPUT_PATH}...")
     cq.exporters.export(result, OUTPUT_PATH)
 
-    print("Classifying faces...")
-    labels = classify_faces(OUTPUT_PATH)
-
     print("Writing labels...")
     write_labels(OUTPUT_PATH, labels)
 